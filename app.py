@@ -1,8 +1,31 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import json
-from typing import Dict, List, Tuple
-from io import StringIO
+import copy
+import queue
+import threading
+import time
+import uuid
+import hashlib
+import gzip
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
 from parsers import NinjaParser, ScoutParser, StaticParser
+from parsers.items import ItemSection
+from parsers.render import render_section_chunk
+from parsers.prefetch import PrefetchScheduler, PREFETCH_ENABLED
+from parsers.response_cache import get_response_cache
+from parsers.base_parser import IN_FLIGHT, LEAGUES, DEFAULT_LEAGUE
+from parsers.base_value import BASE_VALUES
+from parsers.fetch_policy import FETCH_POLICY, STALE_SOURCES
+from parsers.price_history import get_price_history
+from parsers.job_store import get_job_store
+from parsers.metrics import REGISTRY, ITEMS_IN, ITEMS_OUT, timed, request_timings, submit_in_context
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
 
 app = Flask(__name__)
 
@@ -17,30 +40,330 @@ PARSERS = {
     'static': StaticParser()
 }
 
+# Maximum number of upstream requests in flight at once. A full run with every
+# Ninja and Scout category selected fits in a single wave.
+FETCH_WORKERS = 20
+
+# Shared pool used to fetch category URLs concurrently
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+# Maximum number of /jobs runs executing at once
+JOB_WORKERS = 4
+
+# Bounded pool that runs /jobs in the background; job records live in the
+# job store so any worker can answer status and result requests
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+# Maximum number of rendered outputs kept for repeated identical requests
+RENDER_CACHE_MAX_ENTRIES = 64
+
+# Rendered outputs (RenderedOutput) by render key, shared by /process,
+# /process/stream and /jobs; least recently used first
+RENDER_CACHE = OrderedDict()
+RENDER_CACHE_LOCK = threading.Lock()
+
+# Response encodings offered to clients, most preferred first
+RESPONSE_ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+# Bodies smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
+# Compression levels; cached bodies are compressed once per encoding
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Default relative value change below which delta output treats an item as unchanged
+DELTA_TOLERANCE = 0.01
+
+# Number of delta outputs whose emitted values are kept as a baseline for the next delta
+DELTA_SNAPSHOTS_MAX_ENTRIES = 64
+
+# Delta id -> (preset key, emitted {section: {item_id: (value, line)}}), least recently used first
+DELTA_SNAPSHOTS = OrderedDict()
+DELTA_SNAPSHOTS_LOCK = threading.Lock()
+
+# Render cache lookups by result (hit/miss)
+RENDER_CACHE_LOOKUPS = REGISTRY.counter(
+    "render_cache_lookups_total", "Render cache lookups of /process, /process/stream and /jobs runs.", ("result",)
+)
+
+# Cache statistics kept elsewhere, read at scrape time
+for stat in ('hits', 'misses', 'stores', 'revalidations', 'evictions'):
+    REGISTRY.collected(
+        f"response_cache_{stat}_total", f"Upstream response cache {stat}.", "counter",
+        lambda stat=stat: get_response_cache().stats()[stat]
+    )
+REGISTRY.collected("response_cache_entries", "Upstream payloads in the response cache.", "gauge",
+                   lambda: get_response_cache().stats()['entries'])
+REGISTRY.collected("base_value_hits_total", "Base value cache hits.", "counter", lambda: BASE_VALUES.hits)
+REGISTRY.collected("base_value_misses_total", "Base value cache misses.", "counter", lambda: BASE_VALUES.misses)
+REGISTRY.collected("coalesced_fetches_total", "Fetches that joined an identical in-flight request.", "counter",
+                   lambda: IN_FLIGHT.coalesced)
+REGISTRY.collected("render_cache_entries", "Rendered outputs in the render cache.", "gauge",
+                   lambda: len(RENDER_CACHE))
+
+# Keeps every Ninja and Scout category warm in the response cache
+PREFETCHER = PrefetchScheduler([PARSERS['ninja'], PARSERS['scout']], log_callback=app.logger.info)
+if PREFETCH_ENABLED:
+    PREFETCHER.start()
+
 # =============================================================================
 # CORE FUNCTIONS
 # =============================================================================
 
-def create_section_header(section_name: str) -> str:
-    """Create a boxed section header."""
-    box_width = 85
-    line = "/" * box_width
+class EncodedBody:
+    """A response body together with its compressed variants, each built at most once."""
+    
+    __slots__ = ('body', 'variants')
+    
+    def __init__(self, body: bytes):
+        self.body = body
+        self.variants = {}
+    
+    def encode(self, encoding: Optional[str]) -> bytes:
+        """Return the body in the given content encoding (None for identity)."""
+        if encoding is None:
+            return self.body
+        variant = self.variants.get(encoding)
+        if variant is None:
+            if encoding == 'br':
+                variant = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                variant = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+            self.variants[encoding] = variant
+        return variant
+
+
+def json_body(payload: Dict) -> EncodedBody:
+    """Serialize a JSON payload the same way jsonify does."""
+    return EncodedBody(app.json.dumps(payload).encode('utf-8'))
+
+
+class RenderedOutput:
+    """
+    The output of a run together with its log and section events, so a
+    cached run can be replayed to any caller, and its /process body.
+    """
+    
+    __slots__ = ('result', 'events', 'encoded')
+    
+    def __init__(self, result: str, events: List[Dict]):
+        self.result = result
+        # {"type": "log", "message": ...} and {"type": "section", "text": ...} in emission order
+        self.events = events
+        self.encoded = None
+    
+    def logs(self) -> List[str]:
+        return [event['message'] for event in self.events if event['type'] == 'log']
+    
+    def body(self) -> EncodedBody:
+        """Return the /process response body, encoded on first use."""
+        if self.encoded is None:
+            self.encoded = json_body({
+                'success': True,
+                'result': self.result,
+                'logs': self.logs()
+            })
+        return self.encoded
+    
+    def replay(self, log_callback=None, section_callback=None):
+        """Send the recorded events to the callbacks of another run."""
+        for event in self.events:
+            if event['type'] == 'log' and log_callback:
+                log_callback(event['message'])
+            elif event['type'] == 'section' and section_callback:
+                section_callback(event['text'])
+
+
+def negotiate_encoding(body: EncodedBody) -> Optional[str]:
+    """Pick the content encoding for a body from the request's Accept-Encoding."""
+    if len(body.body) < COMPRESSION_MIN_SIZE:
+        return None
+    return request.accept_encodings.best_match(RESPONSE_ENCODINGS)
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """Return the ETag of one encoding of a body; every encoding gets its own tag."""
+    return etag if encoding is None else f"{etag}-{encoding}"
+
+
+def matching_etag(etag: str) -> Optional[str]:
+    """Return the variant of ``etag`` listed in If-None-Match, if any."""
+    for encoding in [None] + RESPONSE_ENCODINGS:
+        tag = variant_etag(etag, encoding)
+        if request.if_none_match.contains(tag):
+            return tag
+    return None
+
+
+def not_modified(tag: str) -> Response:
+    """Return an empty 304 response for a matched ETag."""
+    response = Response(status=304)
+    response.set_etag(tag)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def encoded_response(body: EncodedBody, etag: str = None, mimetype: str = 'application/json') -> Response:
+    """Return a response with the body compressed as negotiated from Accept-Encoding."""
+    encoding = negotiate_encoding(body)
+    response = Response(body.encode(encoding), mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    if etag is not None:
+        response.set_etag(variant_etag(etag, encoding))
+    return response
+
+
+def render_section(section: ItemSection, parser_name: str = "") -> str:
+    """Render one dynamic section (header, filter lines, trailing blank line)."""
+    with timed("format", parser_name, section.name):
+        lines = section.format_lines()
+    with timed("render", parser_name, section.name):
+        return render_section_chunk(section.name, lines)
+
+
+def render_delta(sections: List[ItemSection], delta_key: str, since: Optional[str], delta_id: str, tolerance: float) -> Tuple[str, Dict[str, int], bool]:
+    """
+    Render only the lines that changed since the delta output ``since`` of a preset.
+    
+    Every delta output is stored under its own ``delta_id``, which the client
+    sends back as ``since`` with its next request, so clients polling the same
+    preset each get the changes since their own last output. If ``since`` is
+    unknown (never issued, evicted or of another preset) every line is
+    rendered as added.
+    
+    An item counts as changed if its filter line differs and its value moved
+    by more than ``tolerance`` (relative). Changed and added lines are written
+    under their section header; removed lines follow as comments. Items within
+    the tolerance keep their previous value as the baseline, so slow drift is
+    still reported once it adds up.
+    
+    Returns:
+        The rendered delta, counts of added/changed/removed lines, and whether
+        it is a full output (``since`` was unknown)
+    """
+    delta_chunks = []
+    counts = {'added': 0, 'changed': 0, 'removed': 0}
+    
+    with DELTA_SNAPSHOTS_LOCK:
+        previous = DELTA_SNAPSHOTS.get(since) if since else None
+        if previous is not None and previous[0] != delta_key:
+            previous = None
+        if previous is not None:
+            DELTA_SNAPSHOTS.move_to_end(since)
+        # The previous snapshot stays valid for clients that send ``since`` again
+        snapshot = dict(previous[1]) if previous is not None else {}
+        
+        for section in sections:
+            before = snapshot.get(section.name, {})
+            after = {}
+            emitted = []
+            
+            for item, line in zip(section, section.format_lines()):
+                old = before.get(item.id)
+                if old is None:
+                    counts['added'] += 1
+                    emitted.append(line)
+                    after[item.id] = (item.value, line)
+                elif old[1] != line and abs(item.value - old[0]) > tolerance * max(abs(old[0]), 1e-9):
+                    counts['changed'] += 1
+                    emitted.append(line)
+                    after[item.id] = (item.value, line)
+                else:
+                    after[item.id] = old
+            
+            removed = [old[1] for item_id, old in before.items() if item_id not in after]
+            counts['removed'] += len(removed)
+            snapshot[section.name] = after
+            
+            if emitted or removed:
+                delta_chunks.append(render_section_chunk(
+                    section.name, emitted + [f"// Removed: {line}" for line in removed]
+                ))
+        
+        DELTA_SNAPSHOTS[delta_id] = (delta_key, snapshot)
+        while len(DELTA_SNAPSHOTS) > DELTA_SNAPSHOTS_MAX_ENTRIES:
+            DELTA_SNAPSHOTS.popitem(last=False)
+    
+    return "".join(delta_chunks), counts, previous is None
+
+
+def payload_version(parser, url: str, data: dict) -> Optional[Tuple]:
+    """Return the (source URL, fetched_at) pairs of a cached payload, or None if any source is not cached."""
+    cache = get_response_cache()
+    version = []
+    for source_url in parser.source_urls(url, data):
+        entry = cache.peek(source_url)
+        if entry is None:
+            return None
+        version.append((source_url, entry.fetched_at))
+    return tuple(version)
+
+
+def record_history(parser, url: str, section_name: str, data: dict, base_value: float):
+    """Queue an unfiltered snapshot of a payload's raw prices for the price history store."""
+    history = get_price_history()
+    if history is not None and history.should_ingest(payload_version(parser, url, data), base_value):
+        history.record(
+            parser.name, parser.league, section_name, base_value,
+            lambda: parser.calculate_values(data, 1.0, float('-inf'))
+        )
+
+
+def start_fetches(parser, min_value: float = None) -> List[Future]:
+    """Submit a fetch for every URL of the parser and return the futures in URL order."""
+    return [submit_in_context(FETCH_EXECUTOR, parser.fetch_and_parse, url, min_value) for url in parser.get_urls()]
+
+
+def start_selection(ninja_categories: List[str], scout_categories: List[str], min_value: float, league: str = DEFAULT_LEAGUE) -> Dict[str, Tuple]:
+    """
+    Start fetching every upstream payload of a category selection.
     
-    padding = box_width - 4 - len(section_name)
-    left_pad = padding // 2
-    right_pad = padding - left_pad
+    Each selection works on its own parser copies so concurrent runs keep
+    separate URL lists.
     
-    header = f"{line}\n"
-    header += f"//{' ' * (box_width - 4)}//\n"
-    header += f"//{' ' * left_pad}{section_name}{' ' * right_pad}//\n"
-    header += f"//{' ' * (box_width - 4)}//\n"
-    header += f"{line}\n"
+    Returns:
+        {parser key: (parser copy, fetch futures in URL order)} for every
+        parser with selected categories
+    """
+    selection = {}
+    for parser_key, categories, fetch_min in (('ninja', ninja_categories, None), ('scout', scout_categories, min_value)):
+        if categories:
+            parser = copy.copy(PARSERS[parser_key])
+            parser.set_active_categories(categories, league)
+            selection[parser_key] = (parser, start_fetches(parser, fetch_min))
+    return selection
+
+
+def lookup_base_value(parser, fetches: List[Future]) -> float:
+    """
+    Return the base value a run converts its sections with.
     
-    return header
+    If the run fetched the base value payload itself (e.g. Currency is
+    selected) the value is read from that same payload, otherwise it comes
+    from BASE_VALUES.
+    """
+    url = parser.base_value_url()
+    urls = parser.get_urls()
+    if url is not None and url in urls:
+        return BASE_VALUES.read(parser, url, fetches[urls.index(url)].result())
+    return BASE_VALUES.get(parser)
 
 
-def process_parser(parser, min_value: float, min_value_currency: float, log_callback=None):
-    """Process a single parser and return results."""
+def process_parser(parser, min_value: float, min_value_currency: float, log_callback=None, fetches: List[Future] = None, section_callback=None, max_items_per_section: int = None):
+    """
+    Process a single parser and return results.
+    
+    All URLs are fetched concurrently (or taken from ``fetches`` if the caller
+    already started them) while the base value is looked up (see
+    lookup_base_value), so no section waits on a category it does not need.
+    Sections are processed in URL order as their downloads complete.
+    Returns one ItemSection per URL (named after the URL) and the base value;
+    ``section_callback(section)`` is called as soon as each section is ready.
+    ``max_items_per_section`` keeps only the most valuable items of each section.
+    """
     results_by_section = []
     base_value = None
     
@@ -54,96 +377,120 @@ def process_parser(parser, min_value: float, min_value_currency: float, log_call
         log(f"⚠ No URLs configured, skipping...")
         return results_by_section, base_value
     
+    if fetches is None:
+        fetches = start_fetches(parser)
+    
     log(f"\n{'='*85}")
     log(f"Processing data...")
     log(f"{'='*85}")
     
+    # Every section needs the base value
+    try:
+        log(f"Looking up base value...")
+        with timed("base_value", parser.name):
+            base_value = lookup_base_value(parser, fetches)
+        log(f"✓ Base value found: {base_value}")
+    except Exception as e:
+        log(f"✗ Error looking up base value: {e}")
+        for pending in fetches:
+            pending.cancel()
+        raise
+    
     for i, url in enumerate(urls):
         section_name = parser.extract_section_name(url)
         
         try:
             log(f"\n[{i+1}/{len(urls)}] Fetching data from {section_name}...")
-            data = parser.fetch_and_parse(url)
-            
-            # First URL must have base value
-            if i == 0:
-                log(f"Extracting base value from currency data...")
-                base_value = parser.get_base_value(data)
-                if base_value:
-                    log(f"✓ Base value found: {base_value}")
-                else:
-                    raise ValueError("First URL must contain base value data!")
+            data = fetches[i].result()
+            stale = [STALE_SOURCES.get(source_url) for source_url in parser.source_urls(url, data)]
+            stale = [source for source in stale if source is not None]
+            if stale:
+                log(f"⚠ Upstream unavailable ({stale[0]['reason']}), using cached data from {stale[0]['age']:g}s ago")
             
             log(f"Calculating values using base value: {base_value}...")
             
-            # Use different minimum value for Ninja currency (first URL for Ninja only)
-            if parser.name == "Poe.Ninja" and (section_name == "CURRENCY" or i == 0):
+            # Use different minimum value for Ninja currency
+            if parser.name == "Poe.Ninja" and section_name == "CURRENCY":
                 current_min = min_value_currency
                 log(f"Applying minimum value filter: {current_min} Ex (Currency)")
             else:
                 current_min = min_value
                 log(f"Applying minimum value filter: {current_min} Ex")
             
-            results = parser.calculate_values(data, base_value, current_min)
-            
-            # Format each result according to the parser's template
-            formatted_results = []
-            output_format = parser.get_output_format()
-            for result_tuple in results:
-                # Handle different tuple lengths (Ninja: 3 items, Scout: 4 items)
-                if len(result_tuple) == 4:
-                    # Scout format: (id, name, type, value)
-                    item_id, item_name, item_type, calculated_value = result_tuple
-                    formatted_line = output_format.format(
-                        type=item_type,
-                        name=item_name,
-                        value=f"{calculated_value:.2f}"
-                    )
-                else:
-                    # Ninja format: (id, name, value)
-                    item_id, item_name, calculated_value = result_tuple
-                    formatted_line = output_format.format(
-                        name=item_name,
-                        value=f"{calculated_value:.2f}"
-                    )
-                formatted_results.append((item_id, item_name, calculated_value, formatted_line))
+            with timed("calculate", parser.name, section_name):
+                section = parser.calculate_values(data, base_value, current_min, max_items_per_section)
+            section.name = section_name
+            ITEMS_IN.inc(parser.count_items(data), parser=parser.name, section=section_name)
+            ITEMS_OUT.inc(len(section), parser=parser.name, section=section_name)
+            record_history(parser, url, section_name, data, base_value)
             
-            results_by_section.append((section_name, formatted_results))
-            log(f"✓ Processed {len(formatted_results)} items from this URL (after filtering)")
+            results_by_section.append(section)
+            log(f"✓ Processed {len(section)} items from this URL (after filtering)")
+            if section_callback:
+                section_callback(section)
             
         except Exception as e:
             log(f"✗ Error processing {section_name}: {e}")
-            if i == 0:  # First URL is critical
-                raise
             continue
     
     return results_by_section, base_value
 
 
-def process_with_categories(ninja_categories: List[str], scout_categories: List[str], static_categories: List[str], waystone_tier: int, min_value: float, min_value_currency: float, log_callback=None):
-    """Process selected categories from all parsers and return formatted output."""
-    output = StringIO()
+def process_with_categories(ninja_categories: List[str], scout_categories: List[str], static_categories: List[str], waystone_tier: int, min_value: float, min_value_currency: float, log_callback=None, section_callback=None, max_items_per_section: int = None, delta_key: str = None, delta_since: str = None, delta_id: str = None, delta_tolerance: float = DELTA_TOLERANCE, league: str = DEFAULT_LEAGUE, selection: Dict[str, Tuple] = None):
+    """
+    Process selected categories from all parsers and return formatted output.
+    
+    Ninja and Scout data is fetched for ``league``; every league has its own
+    cached payloads (the league is part of each URL) and its own base value.
+    ``selection`` reuses fetches already started by start_selection for the
+    same categories and league.
+    
+    If ``section_callback`` is given it receives each rendered chunk of the
+    final output (one per dynamic section, then the static rules) as soon as
+    it is ready; the chunks concatenate to the returned output.
+    
+    If ``delta_key`` is given the output only contains the lines that changed
+    since the delta output ``delta_since`` of that preset, and is stored as
+    ``delta_id`` (see render_delta); static rules are only included when
+    ``delta_since`` is unknown.
+    """
+    log_lines = []
+    # Rendered chunks of the dynamic sections, in output order
+    chunks = []
     
     def log(message):
         if log_callback:
             log_callback(message)
-        output.write(message + "\n")
+        log_lines.append(message)
+    
+    def emit_section(section, parser_name):
+        # Every section is rendered at most once; the chunk is reused for the final output
+        if delta_key is None or section_callback:
+            chunk = render_section(section, parser_name)
+            chunks.append(chunk)
+            if section_callback:
+                section_callback(chunk)
     
     log("Currency Exchange Rates (in Exalted Orbs)")
+    log(f"League: {league}")
     log("=" * 85)
     log("")
     
     all_results = []
     static_output = ""
     
+    # Start every upstream fetch up front so Ninja and Scout download in parallel
+    if selection is None:
+        selection = start_selection(ninja_categories, scout_categories, min_value, league)
+    
     # Process Ninja categories
     if ninja_categories:
-        ninja_parser = PARSERS['ninja']
-        ninja_parser.set_active_categories(ninja_categories)
-        
+        ninja_parser, ninja_fetches = selection['ninja']
         try:
             results_by_section, base_value = process_parser(
-                ninja_parser, min_value, min_value_currency, log_callback=log
+                ninja_parser, min_value, min_value_currency, log_callback=log,
+                fetches=ninja_fetches, section_callback=lambda section: emit_section(section, ninja_parser.name),
+                max_items_per_section=max_items_per_section
             )
             all_results.extend(results_by_section)
         except Exception as e:
@@ -153,12 +500,12 @@ def process_with_categories(ninja_categories: List[str], scout_categories: List[
     
     # Process Scout categories
     if scout_categories:
-        scout_parser = PARSERS['scout']
-        scout_parser.set_active_categories(scout_categories)
-        
+        scout_parser, scout_fetches = selection['scout']
         try:
             results_by_section, base_value = process_parser(
-                scout_parser, min_value, min_value_currency, log_callback=log
+                scout_parser, min_value, min_value_currency, log_callback=log,
+                fetches=scout_fetches, section_callback=lambda section: emit_section(section, scout_parser.name),
+                max_items_per_section=max_items_per_section
             )
             all_results.extend(results_by_section)
         except Exception as e:
@@ -178,6 +525,8 @@ def process_with_categories(ninja_categories: List[str], scout_categories: List[
             static_output = static_parser.generate_output(static_categories, waystone_tier)
             total_static = sum(len(subcats) for subcats in static_categories.values())
             log(f"✓ Generated {total_static} static filter rules from {len(static_categories)} categories")
+            if section_callback and static_output:
+                section_callback(static_output)
         except Exception as e:
             log(f"✗ Error processing static categories: {e}")
     
@@ -185,29 +534,27 @@ def process_with_categories(ninja_categories: List[str], scout_categories: List[
     log("Generating final output...")
     log("")
     
-    # Generate final formatted output
-    final_output = StringIO()
-    total_items = 0
+    # Generate final formatted output in a single join over the rendered chunks
+    total_items = sum(len(section) for section in all_results)
     
     # Add dynamic content (Ninja + Scout)
-    for section_name, section_results in all_results:
-        final_output.write(create_section_header(section_name))
-        final_output.write("\n")
-        
-        for item_id, item_name, value, formatted_line in section_results:
-            final_output.write(f"{formatted_line}\n")
-            total_items += 1
-        
-        final_output.write("\n")
+    if delta_key is not None:
+        delta_output, counts, full_delta = render_delta(all_results, delta_key, delta_since, delta_id, delta_tolerance)
+        chunks = [delta_output]
+        if full_delta:
+            log("✓ Delta: no previous output to compare with, sending the full output")
+        log(f"✓ Delta: {counts['changed']} changed, {counts['added']} added, {counts['removed']} removed")
+        if not full_delta:
+            static_output = ""
     
     # Add static content
     if static_output:
-        final_output.write(static_output)
+        chunks.append(static_output)
     
     log(f"✓ Success! Total items processed: {total_items}")
     log("=" * 85)
     
-    return final_output.getvalue(), output.getvalue()
+    return "".join(chunks), "".join(f"{line}\n" for line in log_lines)
 
 
 # =============================================================================
@@ -219,32 +566,184 @@ def index():
     return render_template('index.html')
 
 
+def parse_process_params(data: dict) -> Dict:
+    """Read the processing options from a /process request body."""
+    return {
+        'ninja_categories': data.get('ninja_categories', []),
+        'scout_categories': data.get('scout_categories', []),
+        'static_categories': data.get('static_categories', {}),  # Now expects a dict
+        'waystone_tier': int(data.get('waystone_tier', 1)),
+        'min_value': float(data.get('min_value', 10)),
+        'min_value_currency': float(data.get('min_value_currency', 1)),
+        'max_items_per_section': int(data['max_items_per_section']) if data.get('max_items_per_section') else None,
+        'league': parse_league(data.get('league'))
+    }
+
+
+def parse_league(league: Optional[str]) -> str:
+    """Return the requested league (default if none), rejecting unknown leagues."""
+    if not league:
+        return DEFAULT_LEAGUE
+    if league not in LEAGUES:
+        raise ValueError(f"Unknown league: {league}")
+    return league
+
+
+def params_key(params: Dict) -> str:
+    """Return a canonical key for a set of processing options (order of selections ignored)."""
+    return json.dumps({
+        'ninja_categories': sorted(params['ninja_categories']),
+        'scout_categories': sorted(params['scout_categories']),
+        'static_categories': {
+            name: sorted(subcats) for name, subcats in params['static_categories'].items()
+        },
+        'waystone_tier': params['waystone_tier'],
+        'min_value': params['min_value'],
+        'min_value_currency': params['min_value_currency'],
+        'max_items_per_section': params['max_items_per_section'],
+        'league': params['league']
+    }, sort_keys=True)
+
+
+def data_versions(selection: Dict[str, Tuple]) -> Optional[List[Tuple]]:
+    """
+    Wait for the fetches of a selection (see start_selection) and return the version of its data.
+    
+    Returns:
+        List of (parser name, base value) for every parser involved followed
+        by (url, fetched_at, served stale) in fetch order, or None if any
+        payload could not be fetched or cached.
+    """
+    targets = [
+        (parser, url, fetch)
+        for parser, fetches in selection.values()
+        for url, fetch in zip(parser.get_urls(), fetches)
+    ]
+    
+    cache = get_response_cache()
+    versions = []
+    # The base value is cached separately from the payloads, so it is part of the version
+    for parser, fetches in selection.values():
+        try:
+            versions.append((parser.name, lookup_base_value(parser, fetches)))
+        except Exception:
+            return None
+    for parser, url, fetch in targets:
+        if fetch.exception() is not None:
+            return None
+        for source_url in parser.source_urls(url, fetch.result()):
+            entry = cache.peek(source_url)
+            if entry is None:
+                return None
+            versions.append((source_url, entry.fetched_at, STALE_SOURCES.get(source_url) is not None))
+    return versions
+
+
+def render_key(params: Dict, selection: Dict[str, Tuple]) -> Optional[str]:
+    """
+    Return a key identifying the rendered output for a request, used as its ETag.
+    
+    The key covers the normalized options and the version of every upstream
+    payload of ``selection``, so it changes as soon as any underlying category
+    data changes. Returns None when the data cannot be versioned (e.g. caching
+    disabled), without waiting for the fetches when caching is disabled.
+    """
+    if any(parser.cache_ttl <= 0 for parser, fetches in selection.values()):
+        return None
+    
+    versions = data_versions(selection)
+    if versions is None:
+        return None
+    
+    key = params_key(params) + json.dumps(versions)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def start_render(params: Dict) -> Tuple[Dict[str, Tuple], Optional[str]]:
+    """Start the fetches of a request and return them with its render key (see render_key)."""
+    selection = start_selection(params['ninja_categories'], params['scout_categories'], params['min_value'], params['league'])
+    return selection, render_key(params, selection)
+
+
+def render_output(params: Dict, key: Optional[str], selection: Dict[str, Tuple] = None, log_callback=None, section_callback=None) -> RenderedOutput:
+    """
+    Run process_with_categories for a request, or replay the cached run with the same key.
+    
+    The log and section callbacks receive the events of the run either way.
+    ``selection`` reuses the fetches that produced ``key`` (see start_render).
+    """
+    if key is not None:
+        with RENDER_CACHE_LOCK:
+            cached = RENDER_CACHE.get(key)
+            if cached is not None:
+                RENDER_CACHE.move_to_end(key)
+        RENDER_CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            cached.replay(log_callback, section_callback)
+            return cached
+    
+    events = []
+    
+    def log(message):
+        events.append({'type': 'log', 'message': message})
+        if log_callback:
+            log_callback(message)
+    
+    def emit(text):
+        events.append({'type': 'section', 'text': text})
+        if section_callback:
+            section_callback(text)
+    
+    result, process_log = process_with_categories(**params, log_callback=log, section_callback=emit, selection=selection)
+    output = RenderedOutput(result, events)
+    
+    if key is not None:
+        with RENDER_CACHE_LOCK:
+            RENDER_CACHE[key] = output
+            while len(RENDER_CACHE) > RENDER_CACHE_MAX_ENTRIES:
+                RENDER_CACHE.popitem(last=False)
+    
+    return output
+
+
 @app.route('/process', methods=['POST'])
 def process():
     try:
         data = request.get_json()
-        min_value = float(data.get('min_value', 10))
-        min_value_currency = float(data.get('min_value_currency', 1))
-        ninja_categories = data.get('ninja_categories', [])
-        scout_categories = data.get('scout_categories', [])
-        static_categories = data.get('static_categories', {})  # Now expects a dict
-        waystone_tier = int(data.get('waystone_tier', 1))
-        
-        logs = []
+        params = parse_process_params(data)
         
-        def log_callback(message):
-            logs.append(message)
+        # Delta output depends on what this preset emitted last and a timing
+        # breakdown measures a full run, so neither is memoized
+        if data.get('delta') or data.get('timings'):
+            logs = []
+            delta_id = uuid.uuid4().hex if data.get('delta') else None
+            with request_timings() as timings:
+                result, process_log = process_with_categories(
+                    **params, log_callback=logs.append,
+                    delta_key=params_key(params) if data.get('delta') else None,
+                    delta_since=data.get('delta_since'),
+                    delta_id=delta_id,
+                    delta_tolerance=float(data.get('delta_tolerance', DELTA_TOLERANCE))
+                )
+                payload = {
+                    'success': True,
+                    'result': result,
+                    'logs': logs
+                }
+                if delta_id is not None:
+                    payload['delta_id'] = delta_id
+                if data.get('timings'):
+                    payload['timings'] = timings.breakdown()
+            return encoded_response(json_body(payload))
         
-        result, process_log = process_with_categories(
-            ninja_categories, scout_categories, static_categories, waystone_tier,
-            min_value, min_value_currency, log_callback
-        )
+        # The fetches that version the data are the ones the output is rendered from
+        selection, key = start_render(params)
+        if key is not None:
+            tag = matching_etag(key)
+            if tag is not None:
+                return not_modified(tag)
         
-        return jsonify({
-            'success': True,
-            'result': result,
-            'logs': logs
-        })
+        return encoded_response(render_output(params, key, selection).body(), etag=key)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -252,8 +751,131 @@ def process():
         }), 500
 
 
-@app.route('/categories', methods=['GET'])
-def get_categories():
+@app.route('/process/stream', methods=['POST'])
+def process_stream():
+    """
+    Streaming variant of /process.
+    
+    Returns newline-delimited JSON events as processing progresses:
+    ``{"type": "log", "message": ...}`` for every log line,
+    ``{"type": "section", "text": ...}`` for every finished output chunk
+    (the chunks concatenate to the full result), then a final
+    ``{"type": "done"}`` or ``{"type": "error", "error": ...}``.
+    """
+    try:
+        params = parse_process_params(request.get_json())
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    events = queue.Queue()
+    
+    def run():
+        try:
+            selection, key = start_render(params)
+            render_output(
+                params, key, selection,
+                log_callback=lambda message: events.put({'type': 'log', 'message': message}),
+                section_callback=lambda text: events.put({'type': 'section', 'text': text})
+            )
+            events.put({'type': 'done'})
+        except Exception as e:
+            events.put({'type': 'error', 'error': str(e)})
+    
+    def generate():
+        while True:
+            event = events.get()
+            yield json.dumps(event) + "\n"
+            if event['type'] in ('done', 'error'):
+                break
+    
+    threading.Thread(target=run, name="process-stream", daemon=True).start()
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+
+def run_job(job_id: str, params: Dict):
+    """Run a queued job and record its result."""
+    jobs = get_job_store()
+    jobs.update(job_id, status='running', started_at=time.time())
+    try:
+        selection, key = start_render(params)
+        result = render_output(params, key, selection, log_callback=lambda message: jobs.log(job_id, message)).result
+        jobs.update(job_id, status='done', result=result, finished_at=time.time())
+    except Exception as e:
+        jobs.update(job_id, status='error', error=str(e), finished_at=time.time())
+
+
+def submit_job(params: Dict) -> Dict:
+    """Queue a job, or return the pending / still fresh job for identical options."""
+    job, created = get_job_store().submit(params_key(params))
+    if created:
+        JOB_EXECUTOR.submit(run_job, job['id'], params)
+    return job
+
+
+def job_status(job: Dict) -> Dict:
+    """Return the public view of a job."""
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'error': job['error']
+    }
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Start processing in the background and return a job id right away."""
+    try:
+        params = parse_process_params(request.get_json())
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    job = submit_job(params)
+    response = jsonify({'success': True, **job_status(job)})
+    response.status_code = 202
+    response.headers['Location'] = f"/jobs/{job['id']}"
+    return response
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return the status of a job."""
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    
+    return jsonify({'success': True, **job_status(job), 'logs': job['logs']})
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Return the output of a finished job as a downloadable filter file."""
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    
+    if job['status'] == 'error':
+        return jsonify({'success': False, **job_status(job)}), 500
+    
+    if job['status'] != 'done':
+        return jsonify({'success': True, **job_status(job)}), 202
+    
+    return Response(
+        job['result'],
+        mimetype='text/plain',
+        headers={'Content-Disposition': 'attachment; filename=dyno.ipd'}
+    )
+
+
+def build_categories() -> Dict[str, List[Dict]]:
     """Return available categories for all parsers."""
     all_categories = {
         'ninja': [],
@@ -301,7 +923,82 @@ def get_categories():
             'subcategories': subcategories
         })
     
-    return jsonify({'categories': all_categories})
+    return all_categories
+
+
+# The category definitions only change with the code, so the /categories
+# response is built and tagged once at startup
+CATEGORIES_BODY = json_body({
+    'categories': build_categories(),
+    'leagues': LEAGUES,
+    'default_league': DEFAULT_LEAGUE
+})
+CATEGORIES_ETAG = hashlib.sha1(CATEGORIES_BODY.body).hexdigest()
+
+
+@app.route('/categories', methods=['GET'])
+def get_categories():
+    """Return available categories for all parsers."""
+    tag = matching_etag(CATEGORIES_ETAG)
+    if tag is not None:
+        return not_modified(tag)
+    return encoded_response(CATEGORIES_BODY, etag=CATEGORIES_ETAG)
+
+
+@app.route('/history', methods=['GET'])
+def get_history():
+    """
+    Return recorded prices from the local history store.
+    
+    With ``item_id`` returns the value changes of that item (optionally
+    ``since`` a timestamp); otherwise returns the items of the category whose
+    value changed since ``since`` (default: the last 24 hours). ``league``
+    defaults to the default league.
+    """
+    history = get_price_history()
+    if history is None:
+        return jsonify({'success': False, 'error': 'Price history is disabled'}), 404
+    
+    source = request.args.get('source', '')
+    league = request.args.get('league') or DEFAULT_LEAGUE
+    category = request.args.get('category', '')
+    item_id = request.args.get('item_id')
+    since = request.args.get('since', type=float)
+    
+    if item_id:
+        series = history.series(source, league, category, item_id, since)
+        return jsonify({
+            'success': True,
+            'series': [{'ts': ts, 'value': value} for ts, value in series]
+        })
+    
+    if since is None:
+        since = time.time() - 24 * 60 * 60
+    return jsonify({'success': True, 'changes': history.changes(source, league, category, since)})
+
+
+@app.route('/status', methods=['GET'])
+def get_status():
+    """Return the age of the cached data per league and category, the cache counters and upstream health."""
+    return jsonify({
+        'prefetch': {
+            'enabled': PREFETCHER.thread is not None,
+            'last_cycle': PREFETCHER.last_cycle,
+            'leagues': PREFETCHER.leagues
+        },
+        'categories': PREFETCHER.data_ages(),
+        'cache': get_response_cache().stats(),
+        'base_values': BASE_VALUES.stats(),
+        'coalesced_fetches': IN_FLIGHT.coalesced,
+        'circuits': FETCH_POLICY.stats(),
+        'stale': STALE_SOURCES.snapshot()
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Return stage timings and counters in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,13 @@
+"""
+Offline benchmark suite.
+
+Replays fixture payloads through a local transport adapter so every stage
+(fetch, decode, calculate, format and the end-to-end /process request) can
+be timed without poe.ninja or poe2scout access::
+
+    python -m benchmarks.run --size realistic --output bench_output.json
+    python -m benchmarks.run --size realistic --compare bench_output.json
+
+Live payloads can be recorded once with ``python -m benchmarks.record``; the
+recorded fixtures then replace the synthesized ones as the realistic base.
+"""
@@ -0,0 +1,258 @@
+"""
+Fixture payloads and the transport adapter that replays them.
+
+Payloads are keyed by source and category (the Ninja ``type`` parameter or the
+Scout item kind) and built for one of several sizes:
+
+- ``small``: a handful of rows per category
+- ``realistic``: row counts in the range of the live APIs (or the recorded
+  fixtures, if ``python -m benchmarks.record`` was run)
+- ``10x`` / ``100x``: the realistic payloads with every row replicated
+
+Synthesized rows carry the same extra fields as the live APIs, so decoding
+and field projection do representative work.
+"""
+import hashlib
+import json
+import os
+import random
+import time
+from io import BytesIO
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit, parse_qs
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Recorded live payloads (written by benchmarks.record)
+RECORDED_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "recorded")
+
+# (Ninja lines, Scout items) per category of the synthesized payloads
+BASE_SIZES = {
+    "small": (10, 20),
+    "realistic": (150, 500)
+}
+
+# Replication factor of the scaled sizes (applied to the realistic payloads)
+SCALED_SIZES = {
+    "10x": 10,
+    "100x": 100
+}
+
+SIZES = list(BASE_SIZES) + list(SCALED_SIZES)
+
+# Seed of the synthesized payloads, so every run replays the same data
+FIXTURE_SEED = 2
+
+# Exalted orb value in divines used by the synthesized Currency payload
+EXALTED_VALUE = 0.0025
+
+# =============================================================================
+
+
+def fixture_key(url: str) -> Tuple[str, str]:
+    """Return (source, category) of an upstream URL, e.g. ('ninja', 'Runes') or ('scout', 'armour')."""
+    parts = urlsplit(url)
+    if "poe.ninja" in parts.netloc:
+        return "ninja", parse_qs(parts.query)["type"][0]
+    return "scout", parts.path.rsplit("/", 1)[1]
+
+
+def category_keys(parser) -> List[Tuple[str, str]]:
+    """Return the fixture keys of every category of a parser."""
+    return [fixture_key(parser.category_url(category)) for category in parser.get_categories()]
+
+
+def synth_ninja(category: str, rows: int, rng: random.Random) -> dict:
+    """Build a poe.ninja exchange overview with ``rows`` lines."""
+    items = []
+    lines = []
+    for i in range(rows):
+        item_id = f"{category.lower()}-{i}"
+        value = round(rng.lognormvariate(-4, 2.5), 6)
+        items.append({
+            "id": item_id,
+            "name": f"{category} Item {i}",
+            "image": f"/gen/image/{item_id}.png",
+            "category": category,
+            "detailsId": item_id
+        })
+        lines.append({
+            "id": item_id,
+            "primaryValue": value,
+            "volumePrimaryValue": round(rng.uniform(1, 5000), 2),
+            "maxVolumeCurrency": "divine",
+            "maxVolumeRate": round(1 / value, 4),
+            "sparkline": {
+                "totalChange": round(rng.uniform(-30, 30), 2),
+                "data": [round(rng.uniform(-30, 30), 2) for _ in range(7)]
+            }
+        })
+    if category == "Currency":
+        items.append({"id": "exalted", "name": "Exalted Orb", "image": "/gen/image/exalted.png",
+                      "category": category, "detailsId": "exalted-orb"})
+        lines.append({"id": "exalted", "primaryValue": EXALTED_VALUE, "volumePrimaryValue": 100000.0,
+                      "maxVolumeCurrency": "divine", "maxVolumeRate": 1 / EXALTED_VALUE,
+                      "sparkline": {"totalChange": 0.0, "data": [0.0] * 7}})
+    return {"core": {"primary": "divine", "secondary": "chaos", "rates": {"chaos": 30.0}}, "items": items, "lines": lines}
+
+
+def synth_scout(kind: str, rows: int, rng: random.Random) -> List[dict]:
+    """Build ``rows`` poe2scout unique items, most valuable first."""
+    prices = sorted((round(rng.lognormvariate(1, 2), 2) for _ in range(rows)), reverse=True)
+    items = []
+    for i, price in enumerate(prices):
+        items.append({
+            "id": i,
+            "itemId": 10000 + i,
+            "name": f"{kind.title()} Unique {i}",
+            "type": f"{kind.title()} Base {i % 25}",
+            "text": f"{kind.title()} Unique {i} {kind.title()} Base {i % 25}",
+            "categoryApiId": kind,
+            "iconUrl": f"https://web.poecdn.com/gen/image/{kind}/{i}.png",
+            "currentPrice": price,
+            "priceLogs": [
+                {"price": round(price * rng.uniform(0.8, 1.2), 2), "time": f"2025-01-0{day}T00:00:00", "quantity": rng.randint(1, 50)}
+                for day in range(1, 8)
+            ],
+            "isChanceable": False
+        })
+    return items
+
+
+def replicate(rows: List[dict], factor: int, id_field: str, skip_ids=()) -> List[dict]:
+    """
+    Return ``rows`` repeated ``factor`` times with distinct ids (and names, if present).
+
+    The copies of each row directly follow it, so the upstream ordering (Scout
+    items most valuable first) is kept.
+    """
+    scaled = []
+    for row in rows:
+        scaled.append(row)
+        if row.get(id_field) in skip_ids:
+            continue
+        for copy_number in range(1, factor):
+            copy = dict(row)
+            copy[id_field] = f"{row[id_field]}~{copy_number}"
+            if "name" in row:
+                copy["name"] = f"{row['name']} {copy_number}"
+            scaled.append(copy)
+    return scaled
+
+
+def load_recorded(keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], object]:
+    """Return the recorded payloads of ``keys``, or an empty dict if any is missing."""
+    recorded = {}
+    for source, category in keys:
+        path = os.path.join(RECORDED_DIR, source, f"{category}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        recorded[(source, category)] = payload if source == "ninja" else payload["items"]
+    return recorded
+
+
+class FixtureSet:
+    """Upstream payloads of every category for one size, served as serialized bodies."""
+
+    def __init__(self, size: str, payloads: Dict[Tuple[str, str], object], recorded: bool = False):
+        self.size = size
+        # Ninja categories map to a full payload, Scout categories to their item list
+        self.payloads = payloads
+        self.recorded = recorded
+        self.bodies = {}
+
+    @classmethod
+    def build(cls, size: str, keys: List[Tuple[str, str]]) -> "FixtureSet":
+        """Build the payloads of ``keys`` for a size (see SIZES)."""
+        if size not in BASE_SIZES and size not in SCALED_SIZES:
+            raise ValueError(f"Unknown size: {size}")
+
+        recorded = load_recorded(keys) if size != "small" else {}
+        if recorded:
+            payloads = recorded
+        else:
+            ninja_rows, scout_rows = BASE_SIZES["small" if size == "small" else "realistic"]
+            rng = random.Random(FIXTURE_SEED)
+            payloads = {}
+            for source, category in keys:
+                if source == "ninja":
+                    payloads[(source, category)] = synth_ninja(category, ninja_rows, rng)
+                else:
+                    payloads[(source, category)] = synth_scout(category, scout_rows, rng)
+
+        factor = SCALED_SIZES.get(size, 1)
+        if factor > 1:
+            for key, payload in payloads.items():
+                if key[0] == "ninja":
+                    payloads[key] = dict(
+                        payload,
+                        items=replicate(payload["items"], factor, "id", skip_ids=("exalted",)),
+                        lines=replicate(payload["lines"], factor, "id", skip_ids=("exalted",))
+                    )
+                else:
+                    payloads[key] = replicate(payload, factor, "id")
+        return cls(size, payloads, recorded=bool(recorded))
+
+    def row_count(self) -> int:
+        """Return the number of priced rows across all categories."""
+        return sum(
+            len(payload["lines"]) if source == "ninja" else len(payload)
+            for (source, category), payload in self.payloads.items()
+        )
+
+    def body(self, url: str) -> bytes:
+        """Return the serialized response body for an upstream URL."""
+        body = self.bodies.get(url)
+        if body is None:
+            source, category = fixture_key(url)
+            payload = self.payloads[(source, category)]
+            if source == "scout":
+                query = parse_qs(urlsplit(url).query)
+                page = int(query.get("page", ["1"])[0])
+                per_page = int(query.get("perPage", ["250"])[0])
+                payload = {
+                    "currentPage": page,
+                    "pages": max(1, -(-len(payload) // per_page)),
+                    "total": len(payload),
+                    "items": payload[(page - 1) * per_page:page * per_page]
+                }
+            body = json.dumps(payload).encode("utf-8")
+            self.bodies[url] = body
+        return body
+
+
+class FixtureAdapter(HTTPAdapter):
+    """Transport adapter answering every request from a FixtureSet, with ETag support."""
+
+    def __init__(self, fixtures: FixtureSet, latency: float = 0.0):
+        super().__init__()
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        body = self.fixtures.body(request.url)
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        status = 200
+        if request.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+
+        raw = HTTPResponse(
+            body=BytesIO(body),
+            headers={"Content-Type": "application/json", "Content-Length": str(len(body)), "ETag": etag},
+            status=status,
+            preload_content=False,
+            decode_content=True,
+            request_method=request.method
+        )
+        return self.build_response(request, raw)
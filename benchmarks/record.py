@@ -0,0 +1,51 @@
+"""
+Record live upstream payloads as benchmark fixtures.
+
+Downloads every Ninja and Scout category of a league (all Scout pages) in full,
+without field projection, and writes them to ``benchmarks/fixtures/recorded``::
+
+    python -m benchmarks.record [--league "Fate of the Vaal"]
+"""
+import argparse
+import json
+import os
+from parsers import NinjaParser, ScoutParser
+from parsers.base_parser import DEFAULT_LEAGUE
+from parsers.http_session import get_session, get_timeout
+from .fixtures import RECORDED_DIR, fixture_key
+
+
+def fetch(url: str) -> dict:
+    response = get_session().get(url, timeout=get_timeout())
+    response.raise_for_status()
+    return response.json()
+
+
+def record(league: str = DEFAULT_LEAGUE):
+    """Download and store the payload of every category."""
+    ninja = NinjaParser()
+    scout = ScoutParser()
+    for parser in (ninja, scout):
+        for category in parser.get_categories():
+            url = parser.category_url(category, league)
+            source, key = fixture_key(url)
+            payload = fetch(url)
+            if parser is scout:
+                # Store all pages as one item list
+                items = list(payload.get("items", []))
+                for page in range(2, scout.get_page_count(payload) + 1):
+                    items.extend(fetch(scout.get_page_url(url, page)).get("items", []))
+                payload = {"items": items}
+
+            path = os.path.join(RECORDED_DIR, source, f"{key}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            rows = len(payload.get("lines", payload.get("items", [])))
+            print(f"✓ {parser.name} {category}: {rows} rows -> {path}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--league", default=DEFAULT_LEAGUE)
+    record(arg_parser.parse_args().league)
@@ -0,0 +1,258 @@
+"""
+Time every processing stage against fixture payloads and report the results as JSON.
+
+Stages (one sample = one pass over every Ninja and Scout category):
+
+- ``fetch``: download and decode through the shared session (response cache cleared)
+- ``decode_stream`` / ``decode_json``: incremental and full decoding of the raw bodies
+- ``calculate_cold`` / ``calculate_warm``: calculate_values with and without building the price index
+- ``format``: formatting and rendering every section
+- ``process_cold`` / ``process_warm`` / ``process_cached``: one /process request with
+  every category selected through the Flask test client, with all caches cleared, with
+  the upstream payloads cached, and answered from the render cache
+
+For every stage the report holds p50/p99/mean latency, rows per second and the
+peak traced memory of one extra pass. Usage::
+
+    python -m benchmarks.run [--size realistic] [--iterations N] [--output FILE] [--compare FILE]
+"""
+import os
+
+# Keep benchmark runs from writing history or starting background refreshes
+os.environ.setdefault("PRICE_HISTORY_ENABLED", "0")
+os.environ.setdefault("PREFETCH_ENABLED", "0")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "memory")
+
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Callable, Dict, List
+import app
+from parsers.base_value import BASE_VALUES
+from parsers.http_session import get_session
+from parsers.json_stream import ijson, stream_payload, project_payload
+from parsers.render import render_section_chunk
+from parsers.response_cache import get_response_cache
+from .fixtures import SIZES, FixtureSet, FixtureAdapter, category_keys
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Timed passes per stage by fixture size
+DEFAULT_ITERATIONS = {
+    "small": 200,
+    "realistic": 30,
+    "10x": 5,
+    "100x": 2
+}
+
+# Thresholds used by the calculate / format stages and the /process requests
+MIN_VALUE = 10.0
+MIN_VALUE_CURRENCY = 1.0
+
+# =============================================================================
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def measure(run: Callable[[], None], iterations: int, rows: int, setup: Callable[[], None] = None) -> Dict:
+    """Time ``run`` (after ``setup``, untimed) and trace its peak memory in one extra pass."""
+    if setup:
+        setup()
+    run()  # warm-up
+
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    mean = sum(samples) / len(samples)
+    return {
+        "samples": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(mean * 1000, 3),
+        "rows_per_s": round(rows / mean) if mean > 0 else None,
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+
+def clear_caches():
+    """Forget every cached payload, index, base value and rendered output."""
+    get_response_cache().clear()
+    BASE_VALUES.values.clear()
+    with app.RENDER_CACHE_LOCK:
+        app.RENDER_CACHE.clear()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(size: str, iterations: int, latency: float = 0.0) -> Dict:
+    """Run every stage against the fixtures of one size and return the report."""
+    ninja = app.PARSERS['ninja']
+    scout = app.PARSERS['scout']
+    fixtures = FixtureSet.build(size, category_keys(ninja) + category_keys(scout))
+    adapter = FixtureAdapter(fixtures, latency)
+    get_session().mount("https://", adapter)
+    rows = fixtures.row_count()
+
+    targets = [(parser, parser.category_url(category))
+               for parser in (ninja, scout) for category in parser.get_categories()]
+    stages = {}
+
+    # Fetch (transport + decode + cache store)
+    def fetch_all():
+        for parser, url in targets:
+            parser.fetch_and_parse(url)
+
+    stages["fetch"] = measure(fetch_all, iterations, rows, setup=clear_caches)
+
+    # Decode the raw bodies of every request the fetch stage made
+    clear_caches()
+    fetch_all()
+    bodies = [(parser.payload_fields, fixtures.body(source_url))
+              for parser, url in targets
+              for source_url in parser.source_urls(url, parser.fetch_and_parse(url))]
+
+    # Measured whenever ijson is installed, so the opt-in streaming decode can be compared
+    if ijson is not None:
+        stages["decode_stream"] = measure(
+            lambda: [stream_payload(BytesIO(body), fields) for fields, body in bodies], iterations, rows
+        )
+    stages["decode_json"] = measure(
+        lambda: [project_payload(json.loads(body), fields) for fields, body in bodies], iterations, rows
+    )
+
+    # Calculate and format from the decoded payloads
+    payloads = [(parser, url, parser.fetch_and_parse(url)) for parser, url in targets]
+    base_values = {parser.name: BASE_VALUES.get(parser) for parser in (ninja, scout)}
+
+    def calculate_all():
+        return [
+            parser.calculate_values(data, base_values[parser.name], MIN_VALUE)
+            for parser, url, data in payloads
+        ]
+
+    def clear_indexes():
+        for parser, url, data in payloads:
+            data.derived.pop("price_index", None)
+
+    stages["calculate_cold"] = measure(calculate_all, iterations, rows, setup=clear_indexes)
+    stages["calculate_warm"] = measure(calculate_all, iterations, rows)
+
+    sections = calculate_all()
+    for (parser, url, data), section in zip(payloads, sections):
+        section.name = parser.extract_section_name(url)
+    formatted_rows = sum(len(section) for section in sections)
+    stages["format"] = measure(
+        lambda: "".join(render_section_chunk(section.name, section.format_lines()) for section in sections),
+        iterations, formatted_rows
+    )
+
+    # End-to-end /process requests
+    client = app.app.test_client()
+    body = {
+        'ninja_categories': list(ninja.get_categories()),
+        'scout_categories': list(scout.get_categories()),
+        'static_categories': {},
+        'min_value': MIN_VALUE,
+        'min_value_currency': MIN_VALUE_CURRENCY
+    }
+
+    def process():
+        response = client.post('/process', json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"/process returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    def clear_rendered():
+        with app.RENDER_CACHE_LOCK:
+            app.RENDER_CACHE.clear()
+
+    stages["process_cold"] = measure(process, iterations, rows, setup=clear_caches)
+    stages["process_warm"] = measure(process, iterations, rows, setup=clear_rendered)
+    stages["process_cached"] = measure(process, iterations, rows)
+
+    return {
+        "meta": {
+            "size": size,
+            "recorded_fixtures": fixtures.recorded,
+            "rows": rows,
+            "iterations": iterations,
+            "latency_s": latency,
+            "upstream_requests": adapter.requests,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "timestamp": time.time()
+        },
+        "stages": stages
+    }
+
+
+def summary(report: Dict, baseline: Dict = None) -> str:
+    """Return a table of the p50/p99 latencies, compared with ``baseline`` if given."""
+    lines = [f"{'stage':<16}{'p50 ms':>12}{'p99 ms':>12}{'rows/s':>14}{'peak KiB':>12}" + ("  vs baseline p50" if baseline else "")]
+    for name, stage in report["stages"].items():
+        line = f"{name:<16}{stage['p50_ms']:>12.3f}{stage['p99_ms']:>12.3f}{stage['rows_per_s'] or 0:>14}{stage['peak_kib']:>12.1f}"
+        before = (baseline or {}).get("stages", {}).get(name)
+        if before and before["p50_ms"]:
+            line += f"  {(stage['p50_ms'] / before['p50_ms'] - 1) * 100:+.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Offline benchmarks of every processing stage.")
+    arg_parser.add_argument("--size", choices=SIZES, default="realistic")
+    arg_parser.add_argument("--iterations", type=int, help="timed passes per stage (default depends on --size)")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per upstream request")
+    arg_parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    arg_parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    args = arg_parser.parse_args()
+
+    report = run_benchmarks(args.size, args.iterations or DEFAULT_ITERATIONS[args.size], args.latency)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    print(summary(report, baseline), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
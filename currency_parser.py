@@ -1,6 +1,18 @@
+import hashlib
 import json
+import os
+import re
+import shutil
+import time
 import requests
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from parsers import NinjaParser
+from parsers.fetch_policy import FETCH_POLICY
+from parsers.output_writer import AtomicWriter
+from parsers.render import compile_output_format, render_section_chunk
 
 # =============================================================================
 # CONFIGURATION - Add your URLs here
@@ -13,6 +25,10 @@ MINIMUM_EXALTED_VALUE_CURRENCY = 1.0  # Minimum value specifically for currency
 # Output format template - same for all URLs
 # Available variables: {name}, {exalted_value}
 OUTPUT_FORMAT = '[Type] == "{name}" # [StashItem] == "true" // ExValue = {exalted_value}'
+OUTPUT_FORMAT_FIELDS = ("name", "exalted_value")
+
+# Leave an output file untouched (same mtime) when its content would not change
+SKIP_UNCHANGED_OUTPUT = False
 
 # IMPORTANT: The first URL MUST be the currency URL that contains the exalted value
 # Section name will be extracted from overviewName parameter (e.g., "Currency", "Fragments")
@@ -31,16 +47,41 @@ URLS = [
     "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Delirium",
     "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Breach",
 ]
+
+# Concurrent downloads, and concurrent output files
+BATCH_FETCH_WORKERS = 8
+BATCH_WRITE_WORKERS = 4
+
+# Seconds before a batch download is abandoned (it is retried when the batch is resumed)
+BATCH_FETCH_TIMEOUT = 30
+
+# Fetched payloads and finished presets of an unfinished batch; removed once every preset is written
+BATCH_CHECKPOINT_DIR = ".batch_checkpoint"
+
+# Checkpointed payloads and presets older than this many seconds are fetched and written again
+BATCH_CHECKPOINT_MAX_AGE = 3600
+
+# Output file name of each preset; every preset needs its own name
+# Available variables: {league}, {categories}, {min_value}, {min_value_currency}
+BATCH_OUTPUT_TEMPLATE = "{league}-{categories}-{min_value:g}-{min_value_currency:g}.ipd"
 # =============================================================================
 
 
-def fetch_json_from_url(url: str) -> dict:
-    """Fetch JSON data from a given URL."""
-    response = requests.get(url)
+def fetch_json_from_url(url: str, timeout: float = None) -> dict:
+    """Fetch JSON data from a given URL, retrying through FETCH_POLICY (``timeout`` overrides its per-host timeout)."""
+    response = FETCH_POLICY.get(requests, url, timeout=timeout)
     response.raise_for_status()
     return response.json()
 
 
+def find_exalted_value(data: dict) -> Optional[float]:
+    """Return the divine value of the exalted orb in currency data, or None."""
+    for line in data.get('lines', []):
+        if line['id'] == 'exalted':
+            return line['primaryValue']
+    return None
+
+
 def calculate_exalted_values(data: dict, exalted_divine_value: float = None, min_value: float = 0) -> List[Tuple[str, str, float]]:
     """
     Calculate exalted values for all items.
@@ -55,10 +96,7 @@ def calculate_exalted_values(data: dict, exalted_divine_value: float = None, min
     """
     # If exalted value not provided, try to find it in the data
     if exalted_divine_value is None:
-        for line in data.get('lines', []):
-            if line['id'] == 'exalted':
-                exalted_divine_value = line['primaryValue']
-                break
+        exalted_divine_value = find_exalted_value(data)
     
     if exalted_divine_value is None or exalted_divine_value == 0:
         raise ValueError("Could not find exalted orb value or it's zero")
@@ -85,47 +123,38 @@ def calculate_exalted_values(data: dict, exalted_divine_value: float = None, min
     return results
 
 
-def create_section_header(section_name: str) -> str:
-    """Create a boxed section header."""
-    box_width = 85
-    line = "/" * box_width
-    
-    # Center the section name
-    padding = box_width - 4 - len(section_name)
-    left_pad = padding // 2
-    right_pad = padding - left_pad
-    
-    header = f"{line}\n"
-    header += f"//{' ' * (box_width - 4)}//\n"
-    header += f"//{' ' * left_pad}{section_name}{' ' * right_pad}//\n"
-    header += f"//{' ' * (box_width - 4)}//\n"
-    header += f"{line}\n"
-    
-    return header
+def open_output(output_file: str, skip_unchanged: bool = SKIP_UNCHANGED_OUTPUT) -> AtomicWriter:
+    """Start an output file (replaced atomically on commit) and write its title."""
+    writer = AtomicWriter(output_file, skip_unchanged)
+    writer.write("Currency Exchange Rates (in Exalted Orbs)\n")
+    writer.write("=" * 85 + "\n\n")
+    return writer
 
 
-def write_to_txt(results_by_section: List[Tuple[str, List[Tuple[str, str, float, str]]]], output_file: str):
-    """Write the results to a text file with custom format and section headers."""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("Currency Exchange Rates (in Exalted Orbs)\n")
-        f.write("=" * 85 + "\n\n")
-        
+def render_results(section_name: str, section_results: List[Tuple[str, str, float, str]]) -> str:
+    """Render one section: header, items, spacing between sections."""
+    return render_section_chunk(section_name, (formatted_line for _, _, _, formatted_line in section_results))
+
+
+def write_to_txt(results_by_section: List[Tuple[str, List[Tuple[str, str, float, str]]]], output_file: str, skip_unchanged: bool = SKIP_UNCHANGED_OUTPUT) -> bool:
+    """
+    Write the results to a text file with custom format and section headers.
+    
+    The file is replaced atomically. Returns False if ``skip_unchanged`` left
+    an identical existing file untouched.
+    """
+    writer = open_output(output_file, skip_unchanged)
+    try:
         for section_name, section_results in results_by_section:
-            # Write section header
-            f.write(create_section_header(section_name))
-            f.write("\n")
-            
-            # Write items in this section
-            for item_id, item_name, exalted_value, formatted_line in section_results:
-                f.write(f"{formatted_line}\n")
-            
-            # Add spacing between sections
-            f.write("\n")
+            writer.write(render_results(section_name, section_results))
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
 
 
 def extract_section_name_from_url(url: str) -> str:
     """Extract the section name from the overviewName parameter in the URL."""
-    import re
     match = re.search(r'type=([^&]+)', url)
     if match:
         # Convert CamelCase to UPPER CASE WITH SPACES
@@ -136,13 +165,14 @@ def extract_section_name_from_url(url: str) -> str:
     return "UNKNOWN SECTION"
 
 
-def process_all_urls(urls: List[str] = None, output_file: str = "dyno.ipd"):
+def process_all_urls(urls: List[str] = None, output_file: str = "dyno.ipd", skip_unchanged: bool = SKIP_UNCHANGED_OUTPUT):
     """
     Process multiple URLs. First URL must contain exalted currency data.
     
     Args:
         urls: List of URLs to fetch. First URL must be the currency URL.
         output_file: Path to output text file.
+        skip_unchanged: Leave the output file untouched if its content is the same.
     """
     if urls is None or len(urls) == 0:
         urls = URLS
@@ -153,104 +183,400 @@ def process_all_urls(urls: List[str] = None, output_file: str = "dyno.ipd"):
     results_by_section = []
     exalted_divine_value = None
     
-    for i, url in enumerate(urls):
-        # Extract section name from URL
-        section_name = extract_section_name_from_url(url)
-        format_template = OUTPUT_FORMAT
-        
-        try:
-            print(f"\n[{i+1}/{len(urls)}] Fetching data from {url}...")
-            data = fetch_json_from_url(url)
+    # Sections are streamed to a temporary file as they complete; it replaces
+    # the output file only once every URL has been processed
+    writer = open_output(output_file, skip_unchanged)
+    try:
+        for i, url in enumerate(urls):
+            # Extract section name from URL
+            section_name = extract_section_name_from_url(url)
+            format_line = compile_output_format(OUTPUT_FORMAT, OUTPUT_FORMAT_FIELDS)
             
-            # First URL must have exalted value
-            if i == 0:
-                print("Extracting exalted base value from currency data...")
-                for line in data.get('lines', []):
-                    if line['id'] == 'exalted':
-                        exalted_divine_value = line['primaryValue']
-                        print(f"✓ Exalted base value found: {exalted_divine_value}")
-                        break
+            try:
+                print(f"\n[{i+1}/{len(urls)}] Fetching data from {url}...")
+                data = fetch_json_from_url(url)
                 
-                if exalted_divine_value is None:
-                    raise ValueError("First URL must contain exalted currency data!")
-            
-            print(f"Calculating exalted values using base value: {exalted_divine_value}...")
-            
-            # Use different minimum value for currency (first URL)
-            if section_name == "CURRENCY":
-                min_value = MINIMUM_EXALTED_VALUE_CURRENCY
-                print(f"Applying minimum value filter: {min_value} Ex (Currency)")
-            else:
-                min_value = MINIMUM_EXALTED_VALUE
-                print(f"Applying minimum value filter: {min_value} Ex")
-            
-            # Pass the exalted_divine_value and minimum value to all URLs
-            results = calculate_exalted_values(data, exalted_divine_value, min_value)
-            
-            # Format each result according to the URL's template
-            formatted_results = []
-            for item_id, item_name, exalted_value in results:
-                formatted_line = format_template.format(
-                    name=item_name,
-                    exalted_value=f"{exalted_value:.2f}"
-                )
-                formatted_results.append((item_id, item_name, exalted_value, formatted_line))
-            
-            results_by_section.append((section_name, formatted_results))
-            print(f"✓ Processed {len(formatted_results)} items from this URL (after filtering)")
-            
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Error fetching data from {url}: {e}")
-            if i == 0:  # First URL is critical
-                raise
-            continue
-        except Exception as e:
-            print(f"✗ Error processing {url}: {e}")
-            if i == 0:  # First URL is critical
-                raise
-            continue
+                # First URL must have exalted value
+                if i == 0:
+                    print("Extracting exalted base value from currency data...")
+                    for line in data.get('lines', []):
+                        if line['id'] == 'exalted':
+                            exalted_divine_value = line['primaryValue']
+                            print(f"✓ Exalted base value found: {exalted_divine_value}")
+                            break
+                    
+                    if exalted_divine_value is None:
+                        raise ValueError("First URL must contain exalted currency data!")
+                
+                print(f"Calculating exalted values using base value: {exalted_divine_value}...")
+                
+                # Use different minimum value for currency (first URL)
+                if section_name == "CURRENCY":
+                    min_value = MINIMUM_EXALTED_VALUE_CURRENCY
+                    print(f"Applying minimum value filter: {min_value} Ex (Currency)")
+                else:
+                    min_value = MINIMUM_EXALTED_VALUE
+                    print(f"Applying minimum value filter: {min_value} Ex")
+                
+                # Pass the exalted_divine_value and minimum value to all URLs
+                results = calculate_exalted_values(data, exalted_divine_value, min_value)
+                
+                # Format each result according to the URL's template
+                formatted_results = []
+                for item_id, item_name, exalted_value in results:
+                    formatted_line = format_line(item_name, exalted_value)
+                    formatted_results.append((item_id, item_name, exalted_value, formatted_line))
+                
+                results_by_section.append((section_name, formatted_results))
+                writer.write(render_results(section_name, formatted_results))
+                print(f"✓ Processed {len(formatted_results)} items from this URL (after filtering)")
+                
+            except requests.exceptions.RequestException as e:
+                print(f"✗ Error fetching data from {url}: {e}")
+                if i == 0:  # First URL is critical
+                    raise
+                continue
+            except Exception as e:
+                print(f"✗ Error processing {url}: {e}")
+                if i == 0:  # First URL is critical
+                    raise
+                continue
+    except BaseException:
+        writer.abort()
+        raise
     
     if len(results_by_section) > 0:
         total_items = sum(len(section_results) for _, section_results in results_by_section)
         print(f"\n{'='*85}")
-        print(f"Writing all results to {output_file}...")
-        write_to_txt(results_by_section, output_file)
-        print(f"✓ Success! Results written to {output_file}")
+        print(f"Finishing {output_file}...")
+        if writer.commit():
+            print(f"✓ Success! Results written to {output_file}")
+        else:
+            print(f"✓ Success! {output_file} is unchanged")
         print(f"✓ Total items processed: {total_items}")
         print(f"{'='*85}\n")
+    else:
+        writer.abort()
     
     return results_by_section
 
 
-def main(url: str = None, output_file: str = "dyno.ipd"):
+# Category URL templates of batch mode, shared with the web app
+NINJA = NinjaParser()
+
+
+def category_url(league: str, category: str) -> str:
+    """Return the poe.ninja URL of one category (e.g. "Uncut Gems") in one league."""
+    return NINJA.category_url(category, league)
+
+
+def configured_categories() -> Tuple[str, List[str]]:
+    """Return the league and the poe.ninja categories of the configured URLS."""
+    names = {
+        parse_qs(urlsplit(category['url']).query)['type'][0]: name
+        for name, category in NINJA.get_categories().items()
+    }
+    queries = [parse_qs(urlsplit(url).query) for url in URLS]
+    return queries[0]['league'][0], [names[query['type'][0]] for query in queries]
+
+
+def slugify(text: str) -> str:
+    """Return text reduced to lowercase letters, digits and dashes, for file names."""
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def expand_presets(matrix: dict, output_dir: str = ".") -> List[Dict]:
+    """
+    Expand a preset matrix into one preset per threshold, category set and league.
+    
+    Args:
+        matrix: Dict with any of
+            ``thresholds``: minimum values, each a number or
+                {"min_value": 10, "min_value_currency": 1} (default: the configured minimums)
+            ``category_sets``: {name: [category, ...]} with poe.ninja category names
+                such as "Uncut Gems" (default: {"all": categories of URLS})
+            ``leagues``: league names (default: the league of URLS)
+            ``output``: output file name template (default: BATCH_OUTPUT_TEMPLATE)
+        output_dir: Directory of the output files.
+    
+    Returns:
+        List of preset dicts with league, categories (set name), types,
+        min_value, min_value_currency and output (file path)
+    
+    Raises:
+        ValueError: If a category is unknown or two presets share an output file
+    """
+    default_league, default_categories = configured_categories()
+    thresholds = matrix.get('thresholds') or [MINIMUM_EXALTED_VALUE]
+    category_sets = matrix.get('category_sets') or {'all': default_categories}
+    leagues = matrix.get('leagues') or [default_league]
+    output_template = matrix.get('output', BATCH_OUTPUT_TEMPLATE)
+    
+    for set_name, types in category_sets.items():
+        unknown = [category for category in types if category not in NINJA.get_categories()]
+        if unknown:
+            raise ValueError(f"Unknown categories in {set_name!r}: {', '.join(unknown)}")
+    
+    presets = []
+    for threshold, (set_name, types), league in product(thresholds, category_sets.items(), leagues):
+        if not isinstance(threshold, dict):
+            threshold = {'min_value': threshold}
+        min_value = float(threshold['min_value'])
+        min_value_currency = float(threshold.get('min_value_currency', MINIMUM_EXALTED_VALUE_CURRENCY))
+        output = output_template.format(
+            league=slugify(league), categories=slugify(set_name),
+            min_value=min_value, min_value_currency=min_value_currency
+        )
+        presets.append({
+            'league': league,
+            'categories': set_name,
+            'types': list(types),
+            'min_value': min_value,
+            'min_value_currency': min_value_currency,
+            'output': os.path.join(output_dir, output)
+        })
+    
+    outputs = [preset['output'] for preset in presets]
+    duplicates = sorted(path for path in set(outputs) if outputs.count(path) > 1)
+    if duplicates:
+        raise ValueError(f"Presets share output files (add variables to the output template): {', '.join(duplicates)}")
+    return presets
+
+
+def checkpoint_path(checkpoint_dir: str, kind: str, key: str) -> str:
+    """Return the checkpoint file of a fetched payload ("payloads") or a finished preset ("done")."""
+    return os.path.join(checkpoint_dir, kind, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".json")
+
+
+def load_checkpoint(path: str, max_age: float = BATCH_CHECKPOINT_MAX_AGE) -> Optional[dict]:
+    """
+    Return the JSON stored at a checkpoint path, or None if there is none, it
+    is unreadable or it was saved more than ``max_age`` seconds ago.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(checkpoint, dict) or time.time() - checkpoint.get('saved_at', 0) > max_age:
+        return None
+    return checkpoint['data']
+
+
+def save_checkpoint(path: str, data):
+    """Store JSON and the current time at a checkpoint path; the file appears complete or not at all."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with AtomicWriter(path) as writer:
+        writer.write(json.dumps({'saved_at': time.time(), 'data': data}))
+
+
+def fetch_batch_urls(urls: List[str], checkpoint_dir: str, max_age: float = BATCH_CHECKPOINT_MAX_AGE) -> Dict[str, dict]:
+    """
+    Fetch every URL once, concurrently, restoring payloads checkpointed by an earlier run.
+    
+    Every downloaded payload is checkpointed as soon as it arrives. URLs that
+    fail are left out of the result and fetched again when the batch is resumed,
+    as are checkpointed payloads fetched more than ``max_age`` seconds ago.
+    """
+    payloads = {}
+    pending = []
+    for url in urls:
+        data = load_checkpoint(checkpoint_path(checkpoint_dir, "payloads", url), max_age)
+        if data is not None:
+            payloads[url] = data
+        else:
+            pending.append(url)
+    
+    print(f"Restored {len(payloads)} of {len(urls)} URLs from checkpoint, fetching {len(pending)}...")
+    
+    with ThreadPoolExecutor(max_workers=BATCH_FETCH_WORKERS) as executor:
+        futures = {executor.submit(fetch_json_from_url, url, BATCH_FETCH_TIMEOUT): url for url in pending}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"✗ Error fetching data from {url}: {e}")
+                continue
+            save_checkpoint(checkpoint_path(checkpoint_dir, "payloads", url), data)
+            payloads[url] = data
+            print(f"✓ Fetched {url}")
+    
+    return payloads
+
+
+def calculate_batch_sections(payloads: Dict[str, dict], leagues: List[str]) -> Dict[str, List[Tuple[str, str, float, str]]]:
+    """
+    Calculate and format every item of every fetched URL once, without a minimum.
+    
+    Presets only differ in the categories they include and the minimum value
+    applied, so they all filter these shared rows.
+    
+    Returns:
+        {url: [(id, name, exalted_value, formatted_line), ...]}
+    """
+    format_line = compile_output_format(OUTPUT_FORMAT, OUTPUT_FORMAT_FIELDS)
+    sections = {}
+    for league in leagues:
+        currency = payloads.get(category_url(league, "Currency"))
+        exalted_divine_value = find_exalted_value(currency) if currency is not None else None
+        if not exalted_divine_value:
+            print(f"✗ No exalted base value for {league}, skipping its presets")
+            continue
+        
+        for url, data in payloads.items():
+            if parse_qs(urlsplit(url).query)['league'][0] != league:
+                continue
+            try:
+                results = calculate_exalted_values(data, exalted_divine_value, float('-inf'))
+            except Exception as e:
+                print(f"✗ Error processing {url}: {e}")
+                continue
+            sections[url] = [
+                (item_id, item_name, exalted_value, format_line(item_name, exalted_value))
+                for item_id, item_name, exalted_value in results
+            ]
+    return sections
+
+
+def write_preset(preset: Dict, sections: Dict[str, List[Tuple[str, str, float, str]]], skip_unchanged: bool = SKIP_UNCHANGED_OUTPUT) -> Tuple[int, bool]:
+    """Write the output file of one preset from the shared sections; return its item count and whether it changed."""
+    results_by_section = []
+    for category in preset['types']:
+        url = category_url(preset['league'], category)
+        section_name = extract_section_name_from_url(url)
+        min_value = preset['min_value_currency'] if section_name == "CURRENCY" else preset['min_value']
+        results_by_section.append((section_name, [row for row in sections[url] if row[2] >= min_value]))
+    
+    output_dir = os.path.dirname(preset['output'])
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    changed = write_to_txt(results_by_section, preset['output'], skip_unchanged)
+    return sum(len(section_results) for _, section_results in results_by_section), changed
+
+
+def process_batch(matrix: dict, output_dir: str = ".", checkpoint_dir: str = BATCH_CHECKPOINT_DIR, skip_unchanged: bool = SKIP_UNCHANGED_OUTPUT,
+                  checkpoint_max_age: float = BATCH_CHECKPOINT_MAX_AGE) -> List[Dict]:
+    """
+    Write the output file of every preset of a preset matrix (see expand_presets).
+    
+    Each unique URL is fetched once, every preset is computed from the shared
+    data, and the output files are written in parallel. Fetched payloads and
+    finished presets are checkpointed in ``checkpoint_dir``, so running the
+    same batch again after an interruption or a failure only fetches the
+    missing URLs and only writes the unfinished presets. Checkpoints older
+    than ``checkpoint_max_age`` seconds are not reused, so a batch resumed
+    much later does not mix old and fresh prices. The checkpoint is removed
+    once every preset has been written. With ``skip_unchanged``
+    files whose content is the same are left untouched.
+    
+    Returns:
+        The presets that could not be written (empty on success)
+    """
+    presets = expand_presets(matrix, output_dir)
+    leagues = list(dict.fromkeys(preset['league'] for preset in presets))
+    
+    # Presets finished by an earlier run of this batch
+    pending = []
+    for preset in presets:
+        done = load_checkpoint(checkpoint_path(checkpoint_dir, "done", json.dumps(preset, sort_keys=True)), checkpoint_max_age)
+        if done is not None and os.path.exists(preset['output']):
+            print(f"✓ {preset['output']} already written ({done['items']} items)")
+        else:
+            pending.append(preset)
+    
+    print(f"\n{'='*85}")
+    print(f"Batch: {len(presets)} presets ({len(pending)} to write) across {len(leagues)} league(s)")
+    print(f"{'='*85}\n")
+    
+    failed = []
+    if pending:
+        # Every league needs its currency data for the exalted base value
+        urls = []
+        for preset in pending:
+            urls.append(category_url(preset['league'], "Currency"))
+            urls.extend(category_url(preset['league'], category) for category in preset['types'])
+        urls = list(dict.fromkeys(urls))
+        
+        payloads = fetch_batch_urls(urls, checkpoint_dir, checkpoint_max_age)
+        sections = calculate_batch_sections(payloads, leagues)
+        
+        writable = []
+        for preset in pending:
+            missing = [category for category in preset['types'] if category_url(preset['league'], category) not in sections]
+            if missing or category_url(preset['league'], "Currency") not in payloads:
+                print(f"✗ Skipping {preset['output']}: missing data for {', '.join(missing) or 'Currency'}")
+                failed.append(preset)
+            else:
+                writable.append(preset)
+        
+        print(f"\nWriting {len(writable)} output files...")
+        with ThreadPoolExecutor(max_workers=BATCH_WRITE_WORKERS) as executor:
+            futures = {executor.submit(write_preset, preset, sections, skip_unchanged): preset for preset in writable}
+            for future in as_completed(futures):
+                preset = futures[future]
+                try:
+                    items, changed = future.result()
+                except Exception as e:
+                    print(f"✗ Error writing {preset['output']}: {e}")
+                    failed.append(preset)
+                    continue
+                save_checkpoint(checkpoint_path(checkpoint_dir, "done", json.dumps(preset, sort_keys=True)), {'items': items})
+                print(f"✓ {preset['output']}: {items} items{'' if changed else ' (unchanged)'}")
+    
+    print(f"\n{'='*85}")
+    if failed:
+        print(f"✗ {len(failed)} of {len(presets)} presets failed; run the same batch again to resume")
+    else:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        print(f"✓ Success! {len(presets)} presets written")
+    print(f"{'='*85}\n")
+    
+    return failed
+
+
+def main(url: str = None, output_file: str = "dyno.ipd", skip_unchanged: bool = SKIP_UNCHANGED_OUTPUT):
     """
     Main function to fetch, parse, and output currency data.
     
     Args:
         url: URL to fetch JSON from. If None, will use URLs from configuration.
         output_file: Path to output text file.
+        skip_unchanged: Leave the output file untouched if its content is the same.
     """
     # If URL provided, use single URL mode
     if url is not None:
         urls = [url]
-        return process_all_urls(urls, output_file)
+        return process_all_urls(urls, output_file, skip_unchanged)
     
     # Otherwise use configured URLs
     if len(URLS) > 0:
-        return process_all_urls(URLS, output_file)
+        return process_all_urls(URLS, output_file, skip_unchanged)
     else:
         # Fallback to interactive mode
         url = input("Enter the URL to fetch JSON from: ").strip()
-        return process_all_urls([url], output_file)
+        return process_all_urls([url], output_file, skip_unchanged)
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
     
-    # Check if URL is provided as command line argument
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
-        output_file = sys.argv[2] if len(sys.argv) > 2 else "dyno.ipd"
-        main(url, output_file)
+    arg_parser = argparse.ArgumentParser(description="Write poe.ninja prices as filter rules.")
+    arg_parser.add_argument("url", nargs="?", help="single URL to process (default: the configured URLS)")
+    arg_parser.add_argument("output_file", nargs="?", default="dyno.ipd")
+    arg_parser.add_argument("--batch", metavar="PRESETS", help="JSON preset matrix to write in batch mode")
+    arg_parser.add_argument("--output-dir", default=".", help="directory of the batch output files")
+    arg_parser.add_argument("--checkpoint-dir", default=BATCH_CHECKPOINT_DIR, help="checkpoint directory used to resume a batch")
+    arg_parser.add_argument("--checkpoint-max-age", type=float, default=BATCH_CHECKPOINT_MAX_AGE,
+                            help="seconds after which checkpointed payloads are fetched again")
+    arg_parser.add_argument("--skip-unchanged", action="store_true", default=SKIP_UNCHANGED_OUTPUT,
+                            help="leave output files untouched when their content is the same")
+    args = arg_parser.parse_args()
+    
+    if args.batch:
+        with open(args.batch, encoding="utf-8") as f:
+            matrix = json.load(f)
+        sys.exit(1 if process_batch(matrix, args.output_dir, args.checkpoint_dir, args.skip_unchanged, args.checkpoint_max_age) else 0)
     else:
-        main()
+        main(args.url, args.output_file, args.skip_unchanged)
@@ -1,9 +1,40 @@
 """
 Base parser class that all data source parsers should inherit from.
 """
+import os
 from abc import ABC, abstractmethod
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import List, Tuple, Dict
-import requests
+from urllib.parse import quote_plus
+from .http_session import get_session
+from .fetch_policy import FETCH_POLICY, STALE_SOURCES, FETCH_LATENCY_BUDGET, STALE_MAX_AGE
+from .response_cache import get_response_cache, get_cache_ttl
+from .single_flight import SingleFlight
+from .items import ItemSection
+from .json_stream import streaming_available, stream_payload, project_payload
+from .metrics import timed, UPSTREAM_REQUESTS, UPSTREAM_ERRORS, STALE_SERVED
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Leagues served by this process; category URLs are built per league
+LEAGUES = [
+    league.strip()
+    for league in os.environ.get(
+        "LEAGUES",
+        "Fate of the Vaal,Hardcore Fate of the Vaal,SSF Fate of the Vaal,HC SSF Fate of the Vaal"
+    ).split(",")
+    if league.strip()
+]
+
+# League used when a request does not name one
+DEFAULT_LEAGUE = os.environ.get("DEFAULT_LEAGUE", LEAGUES[0])
+
+# =============================================================================
+
+# Concurrent fetches of the same URL within this process share one upstream request
+IN_FLIGHT = SingleFlight()
 
 
 class BaseParser(ABC):
@@ -13,6 +44,10 @@ class BaseParser(ABC):
         self.name = name
         self.urls = []
         self.output_format = ""
+        self.league = DEFAULT_LEAGUE
+        self.cache_ttl = get_cache_ttl(name)
+        # Top-level arrays and the row fields this parser reads; None keeps the whole payload
+        self.payload_fields = None
     
     @abstractmethod
     def get_urls(self) -> List[str]:
@@ -25,17 +60,58 @@ class BaseParser(ABC):
         pass
     
     @abstractmethod
-    def fetch_and_parse(self, url: str) -> dict:
-        """Fetch and parse JSON from the given URL."""
+    def fetch_and_parse(self, url: str, min_value: float = None, force_refresh: bool = False) -> dict:
+        """
+        Fetch and parse JSON from the given URL.
+        
+        ``min_value`` is a hint that lets sources skip data that cannot meet
+        the threshold; ``force_refresh`` is passed on to fetch_json_from_url.
+        """
         pass
     
+    def set_league(self, league: str):
+        """Select the league category URLs are built for."""
+        if league not in LEAGUES:
+            raise ValueError(f"Unknown league: {league}")
+        self.league = league
+    
+    def quote_league(self, league: str) -> str:
+        """Encode a league name for the league parameter of a category URL."""
+        return quote_plus(league)
+    
+    def category_url(self, category: str, league: str = None) -> str:
+        """Return the URL of a category for ``league`` (default: the parser's league)."""
+        return self.categories[category]["url"].format(
+            league=self.quote_league(self.league if league is None else league)
+        )
+    
+    def base_value_url(self, league: str = None) -> str:
+        """
+        Return the URL of the payload holding the base value for ``league``.
+        
+        None means the base value needs no upstream data (get_base_value is
+        called with an empty payload).
+        """
+        return None
+    
+    def count_items(self, data: dict) -> int:
+        """Return the number of priced items in a payload."""
+        return len(data.get("items", []))
+    
+    def source_urls(self, url: str, data: dict) -> List[str]:
+        """Return every upstream URL that contributed to the data fetched for ``url``."""
+        return [url]
+    
     @abstractmethod
-    def calculate_values(self, data: dict, base_value: float, min_value: float) -> List[Tuple[str, str, float]]:
+    def calculate_values(self, data: dict, base_value: float, min_value: float, limit: int = None) -> ItemSection:
         """
         Calculate item values from the parsed data.
         
+        With ``limit`` only the ``limit`` most valuable matching items are kept.
+        
         Returns:
-            List of tuples: (item_id, item_name, calculated_value)
+            ItemSection holding the items that meet ``min_value``, formatted
+            with this parser's output format
         """
         pass
     
@@ -49,8 +125,96 @@ class BaseParser(ABC):
         """Extract section name from the URL."""
         pass
     
-    def fetch_json_from_url(self, url: str) -> dict:
-        """Fetch JSON data from a given URL."""
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+    def fetch_json_from_url(self, url: str, force_refresh: bool = False) -> dict:
+        """
+        Fetch JSON data from a given URL over the shared keep-alive session.
+        
+        Responses are served from the response cache while they are younger
+        than this parser's cache TTL. Expired entries are revalidated with
+        their ETag / Last-Modified validators; on a 304 the already-parsed
+        payload is reused without downloading or decoding the body again.
+        
+        ``force_refresh`` revalidates with the upstream even if the entry is
+        still fresh (used by the prefetch scheduler).
+        
+        Concurrent calls for the same URL share a single upstream request.
+        
+        If an expired entry cannot be revalidated (the fetch fails or takes
+        longer than FETCH_LATENCY_BUDGET) its payload is served stale and the
+        URL is recorded in STALE_SOURCES; a slow revalidation keeps running in
+        the background and refreshes the cache when it completes.
+        """
+        cache = get_response_cache()
+        entry = cache.lookup(url, self.cache_ttl)
+        if entry is not None and entry.is_fresh(self.cache_ttl) and not force_refresh:
+            return entry.payload
+        
+        if entry is None or force_refresh or entry.age() > STALE_MAX_AGE:
+            return IN_FLIGHT.do(url, self.refresh_url, url, force_refresh)
+        
+        # The revalidation runs in its own thread so it can outlive the latency budget
+        revalidation = IN_FLIGHT.start(url, self.refresh_url, url)
+        try:
+            return revalidation.result(timeout=FETCH_LATENCY_BUDGET)
+        except FutureTimeoutError:
+            reason = f"no response within {FETCH_LATENCY_BUDGET:g}s"
+        except Exception as e:
+            reason = str(e) or type(e).__name__
+        
+        STALE_SOURCES.mark(url, reason, entry.age())
+        STALE_SERVED.inc(parser=self.name)
+        return entry.payload
+    
+    def refresh_url(self, url: str, force_refresh: bool = False) -> dict:
+        """Download (or revalidate) a URL and store the result in the response cache."""
+        cache = get_response_cache()
+        entry = cache.peek(url)
+        
+        # Another request may have refreshed the entry while we were waiting
+        if entry is not None and entry.is_fresh(self.cache_ttl) and not force_refresh:
+            return entry.payload
+        
+        headers = entry.validator_headers() if entry is not None else None
+        stream = self.payload_fields is not None and streaming_available()
+        section = self.extract_section_name(url)
+        # The fetch stage covers the whole round trip, including the decode stage
+        with timed("fetch", self.name, section):
+            try:
+                with FETCH_POLICY.get(get_session(), url, headers=headers, stream=stream) as response:
+                    UPSTREAM_REQUESTS.inc(parser=self.name, status=response.status_code)
+                    if response.status_code == 304 and entry is not None:
+                        cache.revalidated(url)
+                        STALE_SOURCES.clear(url)
+                        return entry.payload
+                    
+                    response.raise_for_status()
+                    with timed("decode", self.name, section):
+                        payload, body = self.decode_response(response, stream)
+            except Exception as e:
+                UPSTREAM_ERRORS.inc(parser=self.name, error=type(e).__name__)
+                raise
+        
+        STALE_SOURCES.clear(url)
+        if self.cache_ttl > 0:
+            payload = cache.set(
+                url, payload, body,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            ).payload
+        return payload
+    
+    def decode_response(self, response, stream: bool) -> Tuple[dict, bytes]:
+        """
+        Decode a response body, keeping only ``payload_fields`` if they are declared.
+        
+        Returns:
+            The payload, and the raw body if it can be cached as-is (None otherwise)
+        """
+        if stream:
+            response.raw.decode_content = True
+            return stream_payload(response.raw, self.payload_fields), None
+        
+        payload = response.json()
+        if self.payload_fields is None:
+            return payload, response.content
+        return project_payload(payload, self.payload_fields), None
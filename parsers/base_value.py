@@ -0,0 +1,103 @@
+"""
+Cache of base values (e.g. the exalted orb rate) kept separately from the payloads they come from.
+
+A Ninja run needs the exalted rate to convert every section, but the rate
+is a single number. It is cached here per base value URL (i.e. per source and
+league), so runs that do not select Currency neither download nor wait on the
+Currency overview while the rate is fresh. A cached rate is tied to the
+download it was read from: it is read again as soon as the source payload in
+the response cache was downloaded again, and it expires no later than that
+payload would. Concurrent lookups of an expired rate share one refresh.
+"""
+import os
+import threading
+import time
+from typing import Dict
+from .response_cache import get_response_cache
+from .single_flight import SingleFlight
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Seconds a base value is reused before it is read again from its source payload
+# (default: the cache TTL of the parser's payloads)
+BASE_VALUE_TTL = float(os.environ["BASE_VALUE_TTL"]) if os.environ.get("BASE_VALUE_TTL") else None
+
+# =============================================================================
+
+
+class BaseValueCache:
+    """Base values by the URL of the payload they are read from."""
+
+    def __init__(self, ttl: float = BASE_VALUE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.values = {}
+        self.in_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, parser, league: str = None, refresh: bool = False) -> float:
+        """
+        Return the base value of a parser for ``league`` (default: the parser's league).
+
+        ``refresh`` reads the value again from the source payload even if the
+        cached value is still fresh (the payload itself may still come from
+        the response cache).
+
+        Raises:
+            ValueError: If the source payload holds no base value
+        """
+        url = parser.base_value_url(league)
+        if url is None:
+            return parser.get_base_value({})
+
+        ttl = self.ttl if self.ttl is not None else parser.cache_ttl
+        entry = get_response_cache().peek(url)
+        with self.lock:
+            cached = self.values.get(url)
+            fresh = (
+                cached is not None and not refresh and time.time() - cached[2] < ttl
+                # A newer download of the source payload replaces the rate right away
+                and (entry is None or entry.fetched_at == cached[1])
+            )
+            if fresh:
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        return self.in_flight.do(url, self.load, parser, url)
+
+    def load(self, parser, url: str) -> float:
+        """Read the base value from its source payload and cache it."""
+        return self.read(parser, url, parser.fetch_json_from_url(url))
+
+    def read(self, parser, url: str, payload: dict) -> float:
+        """
+        Read the base value from a payload of ``url`` and cache it.
+
+        Used directly when a run fetched the source payload itself (e.g.
+        Currency is selected), so its sections are converted with the rate of
+        that same payload.
+        """
+        value = parser.get_base_value(payload)
+        if not value:
+            raise ValueError(f"No base value found in {url}")
+        with self.lock:
+            self.values[url] = (value, getattr(payload, "fetched_at", None), time.time())
+        return value
+
+    def stats(self) -> Dict:
+        """Return the cached values with their age and the hit/miss counters."""
+        now = time.time()
+        with self.lock:
+            values = {
+                url: {"value": value, "age": round(now - loaded_at, 1)}
+                for url, (value, fetched_at, loaded_at) in self.values.items()
+            }
+        return {"hits": self.hits, "misses": self.misses, "values": values}
+
+
+# Shared by every parser in the process
+BASE_VALUES = BaseValueCache()
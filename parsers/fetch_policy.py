@@ -0,0 +1,230 @@
+"""
+Fetch policy for upstream requests: per-host timeouts, retries and circuit breakers.
+
+Every upstream request goes through ``FETCH_POLICY.get``:
+
+- each host has its own (connect, read) timeout
+- connection errors, timeouts and 429/5xx responses are retried a bounded
+  number of times with jittered exponential backoff, within the fetch
+  latency budget
+- a circuit breaker per host opens after consecutive failures; while it is
+  open requests fail immediately with CircuitOpenError, and after a cool-down
+  a single trial request decides whether it closes again
+
+When a fetch of an expired cache entry fails or exceeds the latency budget,
+BaseParser serves the last good payload instead and records it in
+STALE_SOURCES, so a slow or failing upstream does not stall a run.
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from .http_session import get_timeout
+from .metrics import UPSTREAM_RETRIES, CIRCUIT_OPENED
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# (connect, read) timeout in seconds per upstream host (and its subdomains)
+HOST_TIMEOUTS = {
+    "poe.ninja": (
+        float(os.environ.get("NINJA_CONNECT_TIMEOUT", 5)),
+        float(os.environ.get("NINJA_READ_TIMEOUT", 15))
+    ),
+    "poe2scout.com": (
+        float(os.environ.get("SCOUT_CONNECT_TIMEOUT", 5)),
+        float(os.environ.get("SCOUT_READ_TIMEOUT", 20))
+    ),
+}
+
+# Retries after the first attempt of a request
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", 2))
+
+# Backoff before retry n is random between 0 and min(MAX, BASE * 2**n) seconds
+FETCH_BACKOFF_BASE = float(os.environ.get("FETCH_BACKOFF_BASE", 0.5))
+FETCH_BACKOFF_MAX = float(os.environ.get("FETCH_BACKOFF_MAX", 4))
+
+# Response statuses worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Seconds a fetch may take, retries included, before an expired cache entry is served instead
+FETCH_LATENCY_BUDGET = float(os.environ.get("FETCH_LATENCY_BUDGET", 10))
+
+# Consecutive failures that open a host's circuit, and seconds before a trial request
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", 30))
+
+# Cached payloads older than this many seconds are not served when a fetch fails
+STALE_MAX_AGE = float(os.environ.get("STALE_MAX_AGE", 86400))
+
+# =============================================================================
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without contacting a host while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker of one host."""
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        # A trial request is in flight (half-open)
+        self.trial = False
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self) -> bool:
+        """Record a failed request; return True if it (re)opened the circuit."""
+        with self.lock:
+            self.failures += 1
+            reopened = self.trial
+            self.trial = False
+            if reopened or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.trial else "open"
+
+
+class FetchPolicy:
+    """Timeouts, retries and circuit breakers of every upstream host."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def host_key(self, url: str) -> str:
+        """Return the configured host a URL belongs to (or its own host name)."""
+        host = urlsplit(url).hostname or ""
+        for configured in HOST_TIMEOUTS:
+            if host == configured or host.endswith("." + configured):
+                return configured
+        return host
+
+    def timeout(self, host: str) -> Tuple[float, float]:
+        return HOST_TIMEOUTS.get(host, get_timeout())
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker()
+            return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Return the jittered delay before retry ``attempt`` (0-based)."""
+        return random.uniform(0, min(FETCH_BACKOFF_MAX, FETCH_BACKOFF_BASE * 2 ** attempt))
+
+    def get(self, session, url: str, timeout=None, **kwargs) -> requests.Response:
+        """
+        Send a GET through ``session`` (a requests.Session or the requests module).
+
+        Returns the first response that is not worth retrying, or the last one
+        once the retries or the latency budget are used up (the caller checks
+        its status). Raises the last connection error / timeout, any other
+        error at once, or CircuitOpenError while the host's circuit is open.
+        Every failure counts towards the host's circuit breaker.
+        """
+        host = self.host_key(url)
+        breaker = self.breaker(host)
+        deadline = time.monotonic() + FETCH_LATENCY_BUDGET
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {host} after repeated failures")
+
+            error = None
+            response = None
+            try:
+                response = session.get(url, timeout=timeout or self.timeout(host), **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except BaseException:
+                # Not retried, but still recorded so a failed trial request reopens the circuit
+                if breaker.failure():
+                    CIRCUIT_OPENED.inc(host=host)
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.success()
+                    return response
+
+            if breaker.failure():
+                CIRCUIT_OPENED.inc(host=host)
+            delay = self.backoff(attempt)
+            if attempt >= FETCH_RETRIES or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                response.close()
+            UPSTREAM_RETRIES.inc(host=host)
+            time.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """Return the circuit state and consecutive failures of every host contacted so far."""
+        with self.lock:
+            breakers = dict(self.breakers)
+        return {
+            host: {"state": breaker.state(), "failures": breaker.failures}
+            for host, breaker in breakers.items()
+        }
+
+
+class StaleSources:
+    """URLs currently answered with an expired cache entry, and why."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sources = {}
+
+    def mark(self, url: str, reason: str, age: float):
+        with self.lock:
+            self.sources[url] = {"reason": reason, "age": round(age, 1), "since": time.time()}
+
+    def clear(self, url: str):
+        with self.lock:
+            self.sources.pop(url, None)
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self.lock:
+            return self.sources.get(url)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self.lock:
+            return dict(self.sources)
+
+
+# Shared by every parser in the process
+FETCH_POLICY = FetchPolicy()
+STALE_SOURCES = StaleSources()
@@ -0,0 +1,68 @@
+"""
+Shared HTTP transport used by all parsers.
+
+A single pooled ``requests.Session`` is kept per process so repeated fetches
+to poe.ninja and poe2scout.com reuse warm keep-alive connections instead of
+paying a TCP+TLS handshake for every category.
+"""
+import os
+import threading
+from typing import Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Number of distinct hosts to keep connection pools for
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))
+
+# Maximum open connections per host; extra requests wait for a free connection
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 16))
+
+# Seconds to wait for a connection / for the response body
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 30))
+
+HTTP_USER_AGENT = "poe2-currency-parser"
+
+# =============================================================================
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session() -> requests.Session:
+    """Create a session with pooled keep-alive connections and compression enabled."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=True
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": HTTP_USER_AGENT,
+        # Includes "br" when a brotli decoder is installed
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive"
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use (after any fork)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def get_timeout() -> Tuple[float, float]:
+    """Return the default (connect, read) timeout."""
+    return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
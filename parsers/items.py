@@ -0,0 +1,101 @@
+"""
+Compact item records emitted by all parsers.
+
+Every parser returns an ``ItemSection``: item values are kept in a float
+array and ids, names and types are stored as references into one shared,
+process-wide string table, so the same item name is held once no matter how
+many sections, runs or cached payloads refer to it.
+"""
+import threading
+from array import array
+from typing import Iterator, List
+from .render import compile_output_format
+
+
+class StringTable:
+    """Interns strings and hands out small integer references to them."""
+
+    def __init__(self):
+        # Reference 0 is reserved for the empty string (e.g. Ninja items have no type)
+        self.strings = [""]
+        self.refs = {"": 0}
+        self.lock = threading.Lock()
+
+    def ref(self, value: str) -> int:
+        """Return the reference of a string, adding it to the table if needed."""
+        ref = self.refs.get(value)
+        if ref is None:
+            with self.lock:
+                ref = self.refs.get(value)
+                if ref is None:
+                    ref = len(self.strings)
+                    self.strings.append(value)
+                    self.refs[value] = ref
+        return ref
+
+    def __getitem__(self, ref: int) -> str:
+        return self.strings[ref]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+# Shared by every parser in the process
+STRINGS = StringTable()
+
+
+class ItemRecord:
+    """A single calculated item."""
+
+    __slots__ = ("id", "name", "type", "value")
+
+    def __init__(self, item_id: str, name: str, item_type: str, value: float):
+        self.id = item_id
+        self.name = name
+        self.type = item_type
+        self.value = value
+
+
+class ItemSection:
+    """The calculated items of one output section, stored column-wise."""
+
+    __slots__ = ("name", "output_format", "id_refs", "name_refs", "type_refs", "values")
+
+    def __init__(self, name: str = "", output_format: str = ""):
+        self.name = name
+        self.output_format = output_format
+        self.id_refs = array("I")
+        self.name_refs = array("I")
+        self.type_refs = array("I")
+        self.values = array("d")
+
+    def append(self, item_id: str, name: str, value: float, item_type: str = ""):
+        """Add an item to the section."""
+        self.id_refs.append(STRINGS.ref(item_id))
+        self.name_refs.append(STRINGS.ref(name))
+        self.type_refs.append(STRINGS.ref(item_type))
+        self.values.append(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i: int) -> ItemRecord:
+        return ItemRecord(
+            STRINGS[self.id_refs[i]],
+            STRINGS[self.name_refs[i]],
+            STRINGS[self.type_refs[i]],
+            self.values[i]
+        )
+
+    def __iter__(self) -> Iterator[ItemRecord]:
+        for i in range(len(self.values)):
+            yield self[i]
+
+    def format_lines(self) -> List[str]:
+        """Return the filter line of every item using the section's output format."""
+        format_line = compile_output_format(self.output_format)
+        strings = STRINGS.strings
+        return [
+            format_line(strings[name_ref], strings[type_ref], value)
+            for name_ref, type_ref, value in zip(self.name_refs, self.type_refs, self.values)
+        ]
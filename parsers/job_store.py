@@ -0,0 +1,234 @@
+"""
+Store of background job records (status, logs and results of /jobs runs).
+
+A job runs in the worker process that accepted it, but the status and result
+requests that follow can land on any gunicorn worker, so job records are kept
+where every worker can read them. Two backends are available, chosen with the
+``JOB_STORE_BACKEND`` environment variable:
+
+- ``memory``: a dict in this process; only suitable for a single worker.
+- ``sqlite``: tables in a SQLite file shared by every worker on the host
+  (by default the response cache file).
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+from .response_cache import RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_PATH
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# "memory" (per process) or "sqlite" (shared between workers); follows the response cache by default
+JOB_STORE_BACKEND = os.environ.get("JOB_STORE_BACKEND", RESPONSE_CACHE_BACKEND)
+
+# Location of the shared job tables for the sqlite backend
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", RESPONSE_CACHE_PATH)
+
+# Seconds a finished job is reused for identical requests (and kept for polling)
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", 300))
+
+# =============================================================================
+
+# Fields of a job record besides its logs
+JOB_FIELDS = ("id", "key", "status", "created_at", "started_at", "finished_at", "result", "error")
+
+
+def new_job(key: str, now: float) -> Dict:
+    """Return the record of a newly queued job."""
+    return {
+        "id": uuid.uuid4().hex,
+        "key": key,
+        "status": "queued",
+        "created_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+        "logs": []
+    }
+
+
+class MemoryJobStore:
+    """Job records of this process."""
+
+    def __init__(self, result_ttl: float = JOB_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        # Id of the latest job for each normalized request
+        self.by_key = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key: str) -> (Dict, bool):
+        """
+        Return the pending or still fresh job for ``key``, or queue a new one.
+
+        Returns:
+            The job record and whether it was created by this call
+        """
+        now = time.time()
+        with self.lock:
+            self.prune(now)
+            existing = self.jobs.get(self.by_key.get(key))
+            if existing is not None and existing["status"] != "error":
+                return dict(existing, logs=list(existing["logs"])), False
+            job = new_job(key, now)
+            self.jobs[job["id"]] = job
+            self.by_key[key] = job["id"]
+            return dict(job, logs=[]), True
+
+    def prune(self, now: float):
+        """Forget jobs that finished more than result_ttl seconds ago (lock must be held)."""
+        for job_id, job in list(self.jobs.items()):
+            if job["finished_at"] is not None and now - job["finished_at"] > self.result_ttl:
+                del self.jobs[job_id]
+                if self.by_key.get(job["key"]) == job_id:
+                    del self.by_key[job["key"]]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job, logs=list(job["logs"])) if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def log(self, job_id: str, message: str):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job["logs"].append(message)
+
+
+class SQLiteJobStore:
+    """Job records in a SQLite file shared between processes."""
+
+    def __init__(self, path: str = JOB_STORE_PATH, result_ttl: float = JOB_RESULT_TTL):
+        self.path = path
+        self.result_ttl = result_ttl
+        self.local = threading.local()
+
+        with self.connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created_at)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_logs (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    message TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                ) WITHOUT ROWID
+                """
+            )
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the job tables."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def submit(self, key: str) -> (Dict, bool):
+        """
+        Return the pending or still fresh job for ``key``, or queue a new one.
+
+        Returns:
+            The job record and whether it was created by this call
+        """
+        now = time.time()
+        conn = self.connection()
+        with conn:
+            # Serializes submissions of every worker, so identical requests share one job
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (now - self.result_ttl,)
+            )]
+            conn.executemany("DELETE FROM job_logs WHERE job_id = ?", [(job_id,) for job_id in expired])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+
+            row = conn.execute(
+                "SELECT id, status FROM jobs WHERE key = ? ORDER BY created_at DESC LIMIT 1", (key,)
+            ).fetchone()
+            if row is None or row[1] == "error":
+                job = new_job(key, now)
+                conn.execute(
+                    f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({', '.join('?' * len(JOB_FIELDS))})",
+                    [job[field] for field in JOB_FIELDS]
+                )
+                return job, True
+        return self.get(row[0]), False
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        conn = self.connection()
+        row = conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        job["logs"] = [message for (message,) in conn.execute(
+            "SELECT message FROM job_logs WHERE job_id = ? ORDER BY seq", (job_id,)
+        )]
+        return job
+
+    def update(self, job_id: str, **fields):
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+                [*fields.values(), job_id]
+            )
+
+    def log(self, job_id: str, message: str):
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO job_logs (job_id, seq, message) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM job_logs WHERE job_id = ?",
+                (job_id, message, job_id)
+            )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_job_store(kind: str = JOB_STORE_BACKEND):
+    """Create a job store by name."""
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "sqlite":
+        return SQLiteJobStore()
+    raise ValueError(f"Unknown job store backend: {kind}")
+
+
+def get_job_store():
+    """Return the process-wide job store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_job_store()
+    return _store
@@ -0,0 +1,248 @@
+"""
+Per-stage timers and counters exposed in the Prometheus text format.
+
+Processing stages (fetch, decode, base value lookup, calculate, format,
+render) are timed with ``timed(stage, parser, section)``, which records a
+histogram sample and, if the current request asked for it, adds the duration
+to that request's ``RequestTimings`` breakdown. The breakdown is found through
+a context variable, so work submitted to executors has to run in a copy of the
+submitting context (``submit_in_context``) to be attributed to its request.
+
+Metrics are kept per process; with several gunicorn workers each worker
+exposes its own values.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Prefix of every exported metric name
+METRICS_PREFIX = "poe2_parser"
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# =============================================================================
+
+
+def escape_label(value) -> str:
+    """Escape a label value for the text exposition format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Return a Prometheus label set such as {parser="Scout",section="UNIQUE MAP"}."""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            values = list(self.values.items())
+        for key, value in values:
+            yield f"{self.name}{format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    """Cumulative histogram of durations with labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # Label values -> [count per bucket (+Inf last), sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self.values.items()]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                yield f"{self.name}_bucket{format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{format_labels(self.labels, key)} {cumulative}"
+
+
+class Collected:
+    """Metric whose values are read from elsewhere (e.g. cache statistics) at scrape time."""
+
+    def __init__(self, name: str, help_text: str, kind: str, read: Callable[[], float]):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help = help_text
+        self.kind = kind
+        self.read = read
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name} {self.read()}"
+
+
+class Registry:
+    """Set of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        return self.register(Histogram(name, help_text, labels))
+
+    def collected(self, name: str, help_text: str, kind: str, read: Callable[[], float]) -> Collected:
+        return self.register(Collected(name, help_text, kind, read))
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds", "Duration of processing stages.", ("stage", "parser", "section")
+)
+ITEMS_IN = REGISTRY.counter(
+    "items_in_total", "Items read from upstream payloads.", ("parser", "section")
+)
+ITEMS_OUT = REGISTRY.counter(
+    "items_out_total", "Items written to the output after filtering.", ("parser", "section")
+)
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    "upstream_requests_total", "Upstream HTTP requests by response status.", ("parser", "status")
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "upstream_errors_total", "Failed upstream fetches by error type.", ("parser", "error")
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "upstream_retries_total", "Upstream requests retried after an error or a retryable status.", ("host",)
+)
+CIRCUIT_OPENED = REGISTRY.counter(
+    "circuit_opened_total", "Times a host's circuit breaker opened.", ("host",)
+)
+STALE_SERVED = REGISTRY.counter(
+    "stale_served_total", "Expired cache entries served because a fetch failed or was too slow.", ("parser",)
+)
+
+
+class RequestTimings:
+    """Durations of the stages run on behalf of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.entries = []
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, parser: str, section: str, seconds: float):
+        with self.lock:
+            self.entries.append((stage, parser, section, seconds))
+
+    def breakdown(self) -> Dict:
+        """
+        Return the timing breakdown of the request.
+
+        Returns:
+            Dict with the elapsed ``total`` seconds, the summed seconds per
+            ``stages`` (stages of concurrent work overlap, so they can add up
+            to more than the total) and every timed ``entries`` item
+        """
+        with self.lock:
+            entries = list(self.entries)
+        stages = {}
+        for stage, parser, section, seconds in entries:
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        return {
+            "total": round(time.perf_counter() - self.started, 6),
+            "stages": {stage: round(seconds, 6) for stage, seconds in stages.items()},
+            "entries": [
+                {"stage": stage, "parser": parser, "section": section, "seconds": round(seconds, 6)}
+                for stage, parser, section, seconds in entries
+            ]
+        }
+
+
+CURRENT_TIMINGS = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def request_timings() -> Iterator[RequestTimings]:
+    """Collect the stage timings of the work done in this context (and copies of it)."""
+    timings = RequestTimings()
+    token = CURRENT_TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        CURRENT_TIMINGS.reset(token)
+
+
+@contextmanager
+def timed(stage: str, parser: str = "", section: str = ""):
+    """Time a block as one sample of ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage, parser=parser, section=section)
+        timings = CURRENT_TIMINGS.get()
+        if timings is not None:
+            timings.add(stage, parser, section, seconds)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """Submit ``fn`` to ``executor`` so it runs in a copy of the current context."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def map_in_context(executor, fn, iterable) -> List:
+    """Like ``executor.map``, but every call runs in a copy of the current context."""
+    return [future.result() for future in [submit_in_context(executor, fn, item) for item in iterable]]
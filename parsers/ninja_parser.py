@@ -1,9 +1,12 @@
 """
 Parser for poe.ninja data source.
 """
-from typing import List, Tuple
+from typing import List
+from array import array
 import re
 from .base_parser import BaseParser
+from .price_index import PriceIndex, get_price_index
+from .items import ItemSection
 
 
 class NinjaParser(BaseParser):
@@ -13,79 +16,84 @@ class NinjaParser(BaseParser):
         super().__init__("Poe.Ninja")
         self.output_format = '[Type] == "{name}" # [StashItem] == "true" // ExValue = {value}'
         
-        # Define all available categories with their URLs
+        # Define all available categories with their URL templates ({league} is filled in per request)
         self.categories = {
             "Currency": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Currency",
-                "required": True
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Currency",
+                "required": False
             },
             "Fragments": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Fragments",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Fragments",
                 "required": False
             },
             "Abyss": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Abyss",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Abyss",
                 "required": False
             },
             "Uncut Gems": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=UncutGems",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=UncutGems",
                 "required": False
             },
             "Lineage Support Gems": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=LineageSupportGems",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=LineageSupportGems",
                 "required": False
             },
             "Essences": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Essences",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Essences",
                 "required": False
             },
             "Ultimatum": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Ultimatum",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Ultimatum",
                 "required": False
             },
             "Talismans": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Talismans",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Talismans",
                 "required": False
             },
             "Runes": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Runes",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Runes",
                 "required": False
             },
             "Ritual": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Ritual",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Ritual",
                 "required": False
             },
             "Expedition": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Expedition",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Expedition",
                 "required": False
             },
             "Delirium": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Delirium",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Delirium",
                 "required": False
             },
             "Breach": {
-                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league=Fate+of+the+Vaal&type=Breach",
+                "url": "https://poe.ninja/poe2/api/economy/exchange/current/overview?league={league}&type=Breach",
                 "required": False
             }
         }
         
         self.urls = []
+        
+        # Only these fields are read by get_base_value / calculate_values
+        self.payload_fields = {
+            "lines": ("id", "primaryValue"),
+            "items": ("id", "name")
+        }
     
     def get_categories(self):
         """Return available categories."""
         return self.categories
     
-    def set_active_categories(self, active_categories: List[str]):
-        """Set which categories to fetch."""
+    def set_active_categories(self, active_categories: List[str], league: str = None):
+        """Set which categories to fetch (for ``league`` if given)."""
+        if league is not None:
+            self.set_league(league)
         self.urls = []
-        # Always add Currency first (required)
-        if "Currency" in self.categories:
-            self.urls.append(self.categories["Currency"]["url"])
-        
-        # Add selected categories
-        for category in active_categories:
-            if category in self.categories and category != "Currency":
-                self.urls.append(self.categories[category]["url"])
+        # Definition order, so the output does not depend on the order the selection was sent in.
+        # Currency is only fetched if selected; the exalted rate is cached on its own.
+        for category in self.categories:
+            if category in active_categories:
+                self.urls.append(self.category_url(category))
     
     def get_urls(self) -> List[str]:
         """Return list of URLs to fetch from poe.ninja."""
@@ -95,9 +103,17 @@ class NinjaParser(BaseParser):
         """Return the output format template for poe.ninja."""
         return self.output_format
     
-    def fetch_and_parse(self, url: str) -> dict:
+    def fetch_and_parse(self, url: str, min_value: float = None, force_refresh: bool = False) -> dict:
         """Fetch and parse JSON from poe.ninja."""
-        return self.fetch_json_from_url(url)
+        return self.fetch_json_from_url(url, force_refresh)
+    
+    def count_items(self, data: dict) -> int:
+        """Prices are listed in ``lines``."""
+        return len(data.get('lines', []))
+    
+    def base_value_url(self, league: str = None) -> str:
+        """The exalted orb value is read from the Currency overview."""
+        return self.category_url("Currency", league)
     
     def get_base_value(self, data: dict) -> float:
         """Extract exalted orb value from currency data."""
@@ -106,7 +122,7 @@ class NinjaParser(BaseParser):
                 return line['primaryValue']
         return None
     
-    def calculate_values(self, data: dict, exalted_divine_value: float, min_value: float) -> List[Tuple[str, str, float]]:
+    def calculate_values(self, data: dict, exalted_divine_value: float, min_value: float, limit: int = None) -> ItemSection:
         """
         Calculate exalted values for all items from poe.ninja data.
         
@@ -114,34 +130,47 @@ class NinjaParser(BaseParser):
             data: JSON data containing items and their values
             exalted_divine_value: The divine value of exalted orb
             min_value: Minimum exalted value to include
+            limit: Only include the ``limit`` most valuable matching items
         
         Returns:
-            List of tuples: (id, name, exalted_value)
+            ItemSection with the id, name and exalted value of every matching item
         """
         if exalted_divine_value is None or exalted_divine_value == 0:
             raise ValueError("Invalid exalted orb value")
         
-        # Create a mapping of id to name from items
-        id_to_name = {}
-        for item in data.get('items', []):
-            id_to_name[item['id']] = item['name']
+        index = get_price_index(data, self.build_price_index)
         
-        # Calculate exalted value for each item
-        results = []
-        for line in data.get('lines', []):
-            item_id = line['id']
-            item_name = id_to_name.get(item_id, item_id)
-            divine_value = line['primaryValue']
-            
+        # exalted_value >= min_value  <=>  divine_value >= min_value * exalted_divine_value,
+        # so only the top slice of the value-sorted index needs to be divided
+        if exalted_divine_value > 0:
+            positions = index.positions_at_least(min_value * exalted_divine_value, limit)
+        else:
+            positions = range(len(index))
+        
+        results = ItemSection(output_format=self.output_format)
+        for i in positions:
             # Calculate exalted value: item's divine value / exalted's divine value
-            exalted_value = divine_value / exalted_divine_value
+            exalted_value = index.values[i] / exalted_divine_value
             
             # Only include items that meet the minimum value threshold
             if exalted_value >= min_value:
-                results.append((item_id, item_name, exalted_value))
+                results.append(index.ids[i], index.names[i], exalted_value)
         
         return results
     
+    def build_price_index(self, data: dict) -> PriceIndex:
+        """Load the lines of a poe.ninja payload into a columnar price index."""
+        # Create a mapping of id to name from items
+        id_to_name = {}
+        for item in data.get('items', []):
+            id_to_name[item['id']] = item['name']
+        
+        lines = data.get('lines', [])
+        ids = [line['id'] for line in lines]
+        names = [id_to_name.get(item_id, item_id) for item_id in ids]
+        values = array('d', [line['primaryValue'] for line in lines])
+        return PriceIndex(ids, names, values)
+    
     def extract_section_name(self, url: str) -> str:
         """Extract the section name from the overviewName parameter in the URL."""
         match = re.search(r'type=([^&]+)', url)
@@ -0,0 +1,125 @@
+"""
+Atomic, streaming writer for filter output files.
+
+Output is streamed chunk by chunk to a temporary file next to the target,
+fsynced, and renamed over the target in one step, so readers (the game
+client, sync tools) see either the previous file or the complete new one,
+never a truncated file. With ``skip_unchanged`` the rename is skipped when the
+new content hashes the same as the existing file, which leaves its mtime
+alone and keeps downstream sync quiet.
+"""
+import hashlib
+import os
+import tempfile
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Bytes read at a time when hashing an existing output file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Permissions of newly created output files (existing files keep theirs)
+NEW_FILE_MODE = 0o644
+
+# =============================================================================
+
+
+def file_digest(path: str) -> bytes:
+    """Return the SHA-256 digest of a file, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.digest()
+
+
+def fsync_directory(path: str):
+    """Persist a rename in ``path``; not supported on every platform."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class AtomicWriter:
+    """
+    Text file written through a temporary file and moved into place on commit.
+
+    Used as a context manager the file is committed when the block completes
+    and discarded if it raises::
+
+        with AtomicWriter("dyno.ipd") as writer:
+            writer.write(chunk)
+    """
+
+    def __init__(self, path: str, skip_unchanged: bool = False, encoding: str = "utf-8"):
+        self.path = path
+        self.skip_unchanged = skip_unchanged
+        self.encoding = encoding
+        self.digest = hashlib.sha256()
+        self.changed = None
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, self.temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+        )
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, text: str):
+        """Append text to the pending file."""
+        data = text.encode(self.encoding)
+        self.digest.update(data)
+        self.file.write(data)
+
+    def commit(self) -> bool:
+        """
+        Flush, fsync and move the pending file into place.
+
+        Returns:
+            False if the target already held the same content and was left
+            untouched (``skip_unchanged``), True otherwise
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+        if self.skip_unchanged and file_digest(self.path) == self.digest.digest():
+            os.remove(self.temp_path)
+            self.changed = False
+            return False
+
+        try:
+            mode = os.stat(self.path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = NEW_FILE_MODE
+        os.chmod(self.temp_path, mode)
+        os.replace(self.temp_path, self.path)
+        fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+        self.changed = True
+        return True
+
+    def abort(self):
+        """Discard the pending file and leave the target untouched."""
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "AtomicWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
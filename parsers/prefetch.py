@@ -0,0 +1,153 @@
+"""
+Background prefetch scheduler that keeps every category warm in the response cache.
+
+The scheduler can run as a daemon thread inside the Flask app
+(``PREFETCH_ENABLED=1``) or as a companion worker process sharing the SQLite
+response cache with the web workers::
+
+    RESPONSE_CACHE_BACKEND=sqlite python -m parsers.prefetch
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from .response_cache import get_response_cache
+from .base_parser import LEAGUES
+from .base_value import BASE_VALUES
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Start the scheduler inside the web app
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "0") == "1"
+
+# Seconds between refresh cycles; keep this below the cache TTL so entries never expire
+PREFETCH_INTERVAL = float(os.environ.get("PREFETCH_INTERVAL", 240))
+
+# Random +/- seconds added to every cycle so workers do not refresh in lockstep
+PREFETCH_JITTER = float(os.environ.get("PREFETCH_JITTER", 30))
+
+# Concurrent upstream requests per refresh cycle (shared by all leagues)
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", 8))
+
+# Comma-separated leagues kept warm (default: every configured league)
+PREFETCH_LEAGUES = [
+    league.strip()
+    for league in os.environ.get("PREFETCH_LEAGUES", ",".join(LEAGUES)).split(",")
+    if league.strip()
+]
+
+# =============================================================================
+
+
+class PrefetchScheduler:
+    """Periodically refreshes every category of the given parsers and leagues into the response cache."""
+
+    def __init__(self, parsers: List, interval: float = PREFETCH_INTERVAL, jitter: float = PREFETCH_JITTER,
+                 workers: int = PREFETCH_WORKERS, log_callback=None, leagues: List[str] = None):
+        self.parsers = parsers
+        self.leagues = PREFETCH_LEAGUES if leagues is None else leagues
+        self.interval = interval
+        self.jitter = jitter
+        self.workers = workers
+        self.log_callback = log_callback
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_cycle = None
+        self.errors = {}
+
+    def log(self, message: str):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def category_urls(self) -> List[Tuple[object, str, str, str]]:
+        """Return (parser, league, category, url) for every category of every parser and league."""
+        targets = []
+        for league in self.leagues:
+            for parser in self.parsers:
+                for category in parser.get_categories():
+                    targets.append((parser, league, category, parser.category_url(category, league)))
+        return targets
+
+    def refresh_one(self, target: Tuple[object, str, str, str]):
+        parser, league, category, url = target
+        try:
+            parser.fetch_and_parse(url, force_refresh=True)
+            self.errors.pop(url, None)
+        except Exception as e:
+            self.errors[url] = str(e)
+            self.log(f"✗ Prefetch failed for {parser.name} {category} ({league}): {e}")
+
+    def refresh_all(self):
+        """Refresh every category of every league once, concurrently."""
+        targets = self.category_urls()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch") as executor:
+            list(executor.map(self.refresh_one, targets))
+
+        # Re-read the base values from the payloads refreshed above
+        for league in self.leagues:
+            for parser in self.parsers:
+                try:
+                    BASE_VALUES.get(parser, league, refresh=True)
+                except Exception as e:
+                    self.log(f"✗ Prefetch failed for {parser.name} base value ({league}): {e}")
+
+        self.last_cycle = time.time()
+        self.log(f"✓ Prefetched {len(targets) - len(self.errors)}/{len(targets)} categories")
+
+    def next_delay(self) -> float:
+        """Return seconds until the next cycle, including jitter."""
+        return max(1.0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+    def run(self):
+        # Spread the first cycle of several workers started at the same time
+        if self.stop_event.wait(random.uniform(0, self.jitter)):
+            return
+        while not self.stop_event.is_set():
+            self.refresh_all()
+            self.stop_event.wait(self.next_delay())
+
+    def start(self):
+        """Run the scheduler in a daemon thread."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="prefetch", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def data_ages(self) -> Dict[str, Dict[str, dict]]:
+        """
+        Return the age of the cached data for every category of every league.
+
+        Returns:
+            Dict mapping league to parser name to
+            {category: {'age': seconds or None, 'stale': bool, 'error': str or None}}
+        """
+        cache = get_response_cache()
+        ages = {}
+        for parser, league, category, url in self.category_urls():
+            entry = cache.peek(url)
+            age = entry.age() if entry is not None else None
+            ages.setdefault(league, {}).setdefault(parser.name, {})[category] = {
+                "age": round(age, 1) if age is not None else None,
+                "stale": age is None or age >= parser.cache_ttl,
+                "error": self.errors.get(url)
+            }
+        return ages
+
+
+if __name__ == "__main__":
+    from . import NinjaParser, ScoutParser
+
+    scheduler = PrefetchScheduler([NinjaParser(), ScoutParser()], log_callback=print)
+    print(f"Prefetching {', '.join(scheduler.leagues)} every {scheduler.interval:.0f}s (±{scheduler.jitter:.0f}s)...")
+    try:
+        while True:
+            scheduler.refresh_all()
+            time.sleep(scheduler.next_delay())
+    except KeyboardInterrupt:
+        pass
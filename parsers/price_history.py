@@ -0,0 +1,234 @@
+"""
+Persistent price history store.
+
+When enabled (``PRICE_HISTORY_ENABLED=1``), every price snapshot produced by
+a run is written to an embedded SQLite database, so trends and diffs can be
+served locally without re-querying the upstreams. Items are stored with their
+raw upstream value (e.g. the Ninja ``primaryValue`` in divines) and the base
+value (e.g. the exalted rate) is kept as its own series per source and league;
+exalted values are derived at query time. Ingestion is deduplicated twice: a
+payload version (its URLs and their cache ``fetched_at``) that was already
+ingested with the same base value is skipped entirely, and only items whose
+raw value changed since their last recorded price are inserted, so a moving
+exalted rate does not re-insert every row. Writes happen on a single
+background thread so they never delay a request.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from .items import ItemSection
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Record price snapshots of every run (off by default)
+PRICE_HISTORY_ENABLED = os.environ.get("PRICE_HISTORY_ENABLED", "0") == "1"
+
+# Location of the history database
+PRICE_HISTORY_PATH = os.environ.get("PRICE_HISTORY_PATH", "price_history.sqlite3")
+
+# Number of (payload version, base value) pairs remembered as already ingested
+INGESTED_MAX_ENTRIES = 512
+
+# Version of the tables, stored as the database's user_version
+SCHEMA_VERSION = 1
+
+# =============================================================================
+
+# Exalted value of a prices / latest row: its raw value divided by the base
+# value in effect at the row's timestamp (or the earliest one, for a row queued
+# just before the first base value of its source and league was written)
+EXALTED_VALUE = (
+    "{row}.value / COALESCE("
+    "(SELECT b.value FROM base_values b "
+    "WHERE b.source = {row}.source AND b.league = {row}.league AND b.ts <= {row}.ts "
+    "ORDER BY b.ts DESC LIMIT 1), "
+    "(SELECT b.value FROM base_values b "
+    "WHERE b.source = {row}.source AND b.league = {row}.league "
+    "ORDER BY b.ts LIMIT 1))"
+)
+
+
+class PriceHistory:
+    """Append-only price series per (source, league, category, item id)."""
+
+    def __init__(self, path: str = PRICE_HISTORY_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-history")
+        self.ingested = {}
+        self.ingested_lock = threading.Lock()
+
+        with self.connection() as conn:
+            # The primary keys double as the (source, league, category, item_id, ts) index
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS prices (
+                    source TEXT NOT NULL,
+                    league TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (source, league, category, item_id, ts)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS latest (
+                    source TEXT NOT NULL,
+                    league TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (source, league, category, item_id)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS base_values (
+                    source TEXT NOT NULL,
+                    league TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (source, league, ts)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the history database."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def should_ingest(self, version: Tuple, base_value: float) -> bool:
+        """
+        Return True (once) for a payload version / base value pair that has not been ingested yet.
+
+        ``version`` identifies the cached payload, e.g. its URLs and their
+        ``fetched_at``; None (an uncached payload) is always ingested.
+        """
+        if version is None:
+            return True
+        key = (version, base_value)
+        with self.ingested_lock:
+            if key in self.ingested:
+                return False
+            self.ingested[key] = True
+            while len(self.ingested) > INGESTED_MAX_ENTRIES:
+                del self.ingested[next(iter(self.ingested))]
+        return True
+
+    def record(self, source: str, league: str, category: str, base_value: float, snapshot: Callable[[], ItemSection]):
+        """
+        Queue a snapshot for ingestion; ``snapshot`` builds the section on the writer thread.
+
+        The section holds raw upstream values; ``base_value`` converts them to exalted.
+        """
+        ts = time.time()
+        self.writer.submit(lambda: self.ingest(source, league, category, snapshot(), ts, base_value))
+
+    def ingest(self, source: str, league: str, category: str, section: ItemSection, ts: float,
+               base_value: float = 1.0) -> int:
+        """Insert the items of a snapshot whose raw value changed; return the number of rows inserted."""
+        conn = self.connection()
+        with conn:
+            last_base = conn.execute(
+                "SELECT value FROM base_values WHERE source = ? AND league = ? ORDER BY ts DESC LIMIT 1",
+                (source, league)
+            ).fetchone()
+            if last_base is None or last_base[0] != base_value:
+                conn.execute(
+                    "INSERT OR REPLACE INTO base_values (source, league, ts, value) VALUES (?, ?, ?, ?)",
+                    (source, league, ts, base_value)
+                )
+
+            latest = dict(conn.execute(
+                "SELECT item_id, value FROM latest WHERE source = ? AND league = ? AND category = ?",
+                (source, league, category)
+            ).fetchall())
+
+            changed = [item for item in section if latest.get(item.id) != item.value]
+            conn.executemany(
+                "INSERT OR REPLACE INTO prices (source, league, category, item_id, ts, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(source, league, category, item.id, ts, item.value) for item in changed]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO latest (source, league, category, item_id, name, ts, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(source, league, category, item.id, item.name, ts, item.value) for item in changed]
+            )
+        return len(changed)
+
+    def series(self, source: str, league: str, category: str, item_id: str,
+               since: float = None) -> List[Tuple[float, float]]:
+        """Return the (timestamp, exalted value) changes of one item, oldest first."""
+        return self.connection().execute(
+            f"SELECT p.ts, {EXALTED_VALUE.format(row='p')} FROM prices p "
+            "WHERE p.source = ? AND p.league = ? AND p.category = ? AND p.item_id = ? AND p.ts >= ? "
+            "ORDER BY p.ts",
+            (source, league, category, item_id, since or 0)
+        ).fetchall()
+
+    def changes(self, source: str, league: str, category: str, since: float) -> List[Dict]:
+        """
+        Return the items of a category (in one league) whose raw value changed after ``since``.
+
+        Returns:
+            List of dicts with item_id, name, the exalted value at ``since``
+            (None if the item is new) and the latest exalted value, each
+            converted with the base value in effect when it was recorded
+        """
+        conn = self.connection()
+        rows = conn.execute(
+            f"""
+            SELECT l.item_id, l.name, {EXALTED_VALUE.format(row='l')},
+                   (SELECT {EXALTED_VALUE.format(row='p')} FROM prices p
+                    WHERE p.source = l.source AND p.league = l.league AND p.category = l.category
+                      AND p.item_id = l.item_id AND p.ts <= ?
+                    ORDER BY p.ts DESC LIMIT 1)
+            FROM latest l
+            WHERE l.source = ? AND l.league = ? AND l.category = ? AND l.ts > ?
+            ORDER BY l.item_id
+            """,
+            (since, source, league, category, since)
+        ).fetchall()
+        return [
+            {"item_id": item_id, "name": name, "previous": previous, "value": value}
+            for item_id, name, value, previous in rows
+        ]
+
+    def flush(self):
+        """Wait until every queued snapshot has been written."""
+        self.writer.submit(lambda: None).result()
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_price_history() -> Optional[PriceHistory]:
+    """Return the process-wide price history store (None if disabled)."""
+    global _history
+    if not PRICE_HISTORY_ENABLED:
+        return None
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = PriceHistory()
+    return _history
@@ -0,0 +1,61 @@
+"""
+Columnar price index built once per upstream payload.
+
+Payloads are shared through the response cache, so the same payload is
+re-filtered for many users with different thresholds. The index keeps item
+values in a float array together with a value-sorted order, so a threshold
+(or top N) query is a binary search plus a walk over the matching items
+instead of a full rescan of the payload. The index is kept with the payload's
+cache entry (see ``response_cache.derived``) and dropped with it. When the upstream already lists
+items by descending value, matches are a prefix of the payload and a query
+costs O(log n + k).
+"""
+from array import array
+from bisect import bisect_left
+from typing import Callable, List, Sequence
+from .response_cache import derived
+
+# Relative slack applied to thresholds before the binary search, so rows on the
+# boundary are still checked exactly by the caller
+THRESHOLD_SLACK = 1e-9
+
+
+class PriceIndex:
+    """Item ids, names, types and values of one payload, with a value-sorted order."""
+
+    __slots__ = ("ids", "names", "types", "values", "order", "sorted_values", "descending")
+
+    def __init__(self, ids: List[str], names: List[str], values: array, types: List[str] = None):
+        self.ids = ids
+        self.names = names
+        self.types = types
+        self.values = values
+        # Positions of the items in ascending value order; among equal values
+        # earlier positions rank higher, matching a descending upstream order
+        self.order = array("l", sorted(range(len(values)), key=lambda i: (values[i], -i)))
+        self.sorted_values = array("d", (values[i] for i in self.order))
+        # True if the payload already lists items by descending value
+        self.descending = all(values[i] >= values[i + 1] for i in range(len(values) - 1))
+
+    def __len__(self):
+        return len(self.values)
+
+    def positions_at_least(self, threshold: float, limit: int = None) -> Sequence[int]:
+        """
+        Return positions (in payload order) of items whose value may be >= ``threshold``.
+
+        With ``limit`` only the ``limit`` most valuable of those items are returned.
+        """
+        threshold -= abs(threshold) * THRESHOLD_SLACK
+        start = bisect_left(self.sorted_values, threshold)
+        if limit is not None:
+            start = max(start, len(self.order) - limit)
+
+        if self.descending:
+            return range(len(self.order) - start)
+        return sorted(self.order[start:])
+
+
+def get_price_index(data: dict, build: Callable[[dict], PriceIndex]) -> PriceIndex:
+    """Return the index for a payload, building it with ``build`` once per cache entry."""
+    return derived(data, "price_index", lambda: build(data))
@@ -0,0 +1,70 @@
+"""
+Render stage shared by the web app and the CLI.
+
+Output templates are compiled once into positional format strings, section
+headers are cached by name, and sections are rendered as one chunk each so
+the output can be joined once, streamed into an HTTP response, or written to
+a file without intermediate buffers.
+"""
+from functools import lru_cache
+from string import Formatter
+from typing import Callable, Iterable, Tuple
+
+# Width of the boxed section headers
+BOX_WIDTH = 85
+
+# Template fields of the parsers' output formats, in the compiled formatter's
+# argument order; the last field is the numeric value
+TEMPLATE_FIELDS = ("name", "type", "value")
+
+
+@lru_cache(maxsize=None)
+def create_section_header(section_name: str) -> str:
+    """Create a boxed section header."""
+    line = "/" * BOX_WIDTH
+
+    padding = BOX_WIDTH - 4 - len(section_name)
+    left_pad = padding // 2
+    right_pad = padding - left_pad
+
+    return (
+        f"{line}\n"
+        f"//{' ' * (BOX_WIDTH - 4)}//\n"
+        f"//{' ' * left_pad}{section_name}{' ' * right_pad}//\n"
+        f"//{' ' * (BOX_WIDTH - 4)}//\n"
+        f"{line}\n"
+    )
+
+
+@lru_cache(maxsize=None)
+def compile_output_format(template: str, fields: Tuple[str, ...] = TEMPLATE_FIELDS) -> Callable[..., str]:
+    """
+    Compile an output template into a positional formatter.
+
+    The returned callable takes the values of ``fields`` positionally, e.g.
+    ``(name, type, value)``; the value (last field) is formatted with two
+    decimals. Templates using conversions or format specs fall back to
+    keyword formatting with the same result as ``str.format``.
+    """
+    value_field = fields[-1]
+    compiled = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        compiled.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if field not in fields or spec or conversion:
+            def format_line(*args):
+                values = dict(zip(fields, args))
+                values[value_field] = f"{values[value_field]:.2f}"
+                return template.format(**values)
+            return format_line
+        position = fields.index(field)
+        compiled.append(f"{{{position}:.2f}}" if field == value_field else f"{{{position}}}")
+    return "".join(compiled).format
+
+
+def render_section_chunk(section_name: str, lines: Iterable[str]) -> str:
+    """Render one dynamic section (header, filter lines, trailing blank line) as a single chunk."""
+    body = "".join(f"{line}\n" for line in lines)
+    return f"{create_section_header(section_name)}\n{body}\n"
+
@@ -0,0 +1,353 @@
+"""
+TTL response cache for upstream economy endpoints.
+
+Responses are keyed by URL and kept fresh for a per-source TTL. Two backends
+are available:
+
+- ``memory``: an in-process LRU holding the parsed payloads.
+- ``sqlite``: an on-disk LRU shared by every gunicorn worker on the host.
+
+The backend is chosen with the ``RESPONSE_CACHE_BACKEND`` environment variable.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# "memory" (per process) or "sqlite" (shared between workers)
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+
+# Location of the shared cache file for the sqlite backend
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+
+# Maximum number of cached URLs before the least recently used one is evicted
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 256))
+
+# Seconds a cached response stays fresh, per parser name (0 disables caching)
+DEFAULT_CACHE_TTL = float(os.environ.get("DEFAULT_CACHE_TTL", 300))
+CACHE_TTL_BY_SOURCE = {
+    "Poe.Ninja": float(os.environ.get("NINJA_CACHE_TTL", DEFAULT_CACHE_TTL)),
+    "Scout": float(os.environ.get("SCOUT_CACHE_TTL", DEFAULT_CACHE_TTL)),
+}
+
+# Bumped whenever the SQLite table layout changes; older cache files are discarded
+SCHEMA_VERSION = 1
+
+# =============================================================================
+
+
+class CachedPayload(dict):
+    """
+    Decoded payload of a cache entry.
+
+    ``derived`` holds data computed from the payload (price indexes, merged
+    pages), so it lives exactly as long as the entry's payload and is dropped
+    when the entry is evicted or replaced by a newer download.
+    """
+
+    __slots__ = ("fetched_at", "derived")
+
+    def __init__(self, payload: dict, fetched_at: float):
+        super().__init__(payload)
+        self.fetched_at = fetched_at
+        self.derived = {}
+
+
+def derived(payload: dict, key, build: Callable[[], object]):
+    """
+    Return the data stored under ``key`` for a cached payload, building it on first use.
+
+    Payloads that are not cached (e.g. with caching disabled) have nowhere to
+    keep it, so ``build`` runs on every call.
+    """
+    store = getattr(payload, "derived", None)
+    if store is None:
+        return build()
+    value = store.get(key)
+    if value is None:
+        value = store.setdefault(key, build())
+    return value
+
+
+class CacheEntry:
+    """A cached upstream response and the validators needed to revalidate it."""
+
+    __slots__ = ("payload", "fetched_at", "validated_at", "etag", "last_modified")
+
+    def __init__(self, payload: dict, fetched_at: float, validated_at: float = None,
+                 etag: str = None, last_modified: str = None):
+        if not isinstance(payload, CachedPayload):
+            payload = CachedPayload(payload, fetched_at)
+        self.payload = payload
+        # When the body was downloaded
+        self.fetched_at = fetched_at
+        # When the upstream last confirmed the body is current
+        self.validated_at = fetched_at if validated_at is None else validated_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def validator_headers(self) -> Dict[str, str]:
+        """Return the conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def age(self) -> float:
+        """Return seconds since the entry was last confirmed by the upstream."""
+        return time.time() - self.validated_at
+
+    def is_fresh(self, ttl: float) -> bool:
+        """Return True if the entry is younger than ``ttl`` seconds."""
+        return self.age() < ttl
+
+
+class MemoryBackend:
+    """In-process LRU of parsed payloads."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+
+    def set(self, url: str, entry: CacheEntry, body: bytes = None):
+        with self.lock:
+            self.entries[url] = entry
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def touch(self, url: str, validated_at: float):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                entry.validated_at = validated_at
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteBackend:
+    """
+    On-disk LRU shared between processes.
+
+    Raw response bodies are stored in SQLite. Each process keeps the decoded
+    payload of the bodies it has already read, so a hit only decodes JSON
+    when another worker stored a newer body.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.decoded = {}
+        self.decoded_lock = threading.Lock()
+        self.evictions = 0
+
+        with self.connection() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS responses")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    validated_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the cache file."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        conn = self.connection()
+        with conn:
+            row = conn.execute(
+                "SELECT fetched_at, validated_at, etag, last_modified FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+
+        fetched_at, validated_at, etag, last_modified = row
+        with self.decoded_lock:
+            decoded = self.decoded.get(url)
+        if decoded is not None and decoded[0] == fetched_at:
+            payload = decoded[1]
+        else:
+            body = conn.execute("SELECT body FROM responses WHERE url = ?", (url,)).fetchone()
+            if body is None:
+                return None
+            payload = CachedPayload(json.loads(body[0]), fetched_at)
+            with self.decoded_lock:
+                self.decoded[url] = (fetched_at, payload)
+        return CacheEntry(payload, fetched_at, validated_at, etag, last_modified)
+
+    def set(self, url: str, entry: CacheEntry, body: bytes = None):
+        if body is None:
+            body = json.dumps(entry.payload).encode("utf-8")
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(url, body, fetched_at, validated_at, accessed_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, entry.fetched_at, entry.validated_at, time.time(),
+                 entry.etag, entry.last_modified)
+            )
+            evicted = conn.execute(
+                "DELETE FROM responses WHERE url IN ("
+                "SELECT url FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        with self.decoded_lock:
+            self.decoded[url] = (entry.fetched_at, entry.payload)
+            if evicted:
+                self.evictions += evicted
+                self.decoded.clear()
+
+    def touch(self, url: str, validated_at: float):
+        conn = self.connection()
+        with conn:
+            conn.execute("UPDATE responses SET validated_at = ? WHERE url = ?", (validated_at, url))
+
+    def clear(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM responses")
+        with self.decoded_lock:
+            self.decoded.clear()
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """URL-keyed response cache with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.revalidations = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, url: str, ttl: float) -> Optional[CacheEntry]:
+        """
+        Return the cached entry for a URL regardless of its age.
+        
+        Counts a hit if the entry is fresher than ``ttl`` seconds and a miss
+        otherwise; stale entries are still returned so they can be revalidated.
+        """
+        entry = self.backend.get(url) if ttl > 0 else None
+        fresh = entry is not None and entry.is_fresh(ttl)
+        with self.lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def peek(self, url: str) -> Optional[CacheEntry]:
+        """Return the cached entry for a URL without counting a hit or miss."""
+        return self.backend.get(url)
+
+    def get(self, url: str, ttl: float) -> Optional[dict]:
+        """Return the cached payload if it is fresher than ``ttl`` seconds, else None."""
+        entry = self.lookup(url, ttl)
+        return entry.payload if entry is not None and entry.is_fresh(ttl) else None
+
+    def set(self, url: str, payload: dict, body: bytes = None, etag: str = None, last_modified: str = None) -> CacheEntry:
+        """Store a freshly downloaded payload (and its raw body, if available) and return its entry."""
+        entry = CacheEntry(payload, time.time(), etag=etag, last_modified=last_modified)
+        self.backend.set(url, entry, body)
+        with self.lock:
+            self.stores += 1
+        return entry
+
+    def revalidated(self, url: str):
+        """Mark a cached entry as confirmed current by the upstream (HTTP 304)."""
+        self.backend.touch(url, time.time())
+        with self.lock:
+            self.revalidations += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for the cache."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "revalidations": self.revalidations,
+                "evictions": self.backend.evictions,
+                "entries": len(self.backend)
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def create_backend(kind: str = RESPONSE_CACHE_BACKEND):
+    """Create a cache backend by name."""
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend()
+    raise ValueError(f"Unknown response cache backend: {kind}")
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(create_backend())
+    return _cache
+
+
+def get_cache_ttl(source: str) -> float:
+    """Return the cache TTL in seconds for a parser name."""
+    return CACHE_TTL_BY_SOURCE.get(source, DEFAULT_CACHE_TTL)
@@ -1,9 +1,31 @@
 """
 Parser for poe2scout.com data source for unique items.
 """
-from typing import List, Tuple
+from typing import List
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote
+import math
+import os
 import re
 from .base_parser import BaseParser
+from .items import ItemSection
+from .price_index import PriceIndex, get_price_index
+from .response_cache import CachedPayload, derived
+from .metrics import map_in_context
+
+# Number of additional result pages fetched at once per category
+PAGE_FETCH_BATCH = 4
+
+# Pool for page fetches of all categories (separate from the callers' pools so
+# nested fetches cannot deadlock)
+PAGE_FETCH_WORKERS = 16
+PAGE_EXECUTOR = ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS, thread_name_prefix="scout-page")
+
+# Stop requesting pages once prices drop below the minimum value. This relies on
+# poe2scout listing items by descending price (the API has no documented sort
+# parameter); set SCOUT_EARLY_STOP=0 to always fetch every page
+SCOUT_EARLY_STOP = os.environ.get("SCOUT_EARLY_STOP", "1") == "1"
 
 
 class ScoutParser(BaseParser):
@@ -13,47 +35,59 @@ class ScoutParser(BaseParser):
         super().__init__("Scout")
         self.output_format = '[Type] == "{type}" && [Rarity] == "Unique" # [UniqueName] == "{name}" && [StashItem] == "true" // ExValue = {value}'
         
-        # Define all available categories with their URLs
+        # Define all available categories with their URL templates ({league} is filled in per request)
         self.categories = {
             "Accessories": {
-                "url": "https://poe2scout.com/api/items/unique/accessory?page=1&perPage=250&league=Fate%20of%20the%20Vaal&search=&referenceCurrency=exalted",
+                "url": "https://poe2scout.com/api/items/unique/accessory?page=1&perPage=250&league={league}&search=&referenceCurrency=exalted",
                 "required": False
             },
             "Armour": {
-                "url": "https://poe2scout.com/api/items/unique/armour?page=1&perPage=250&league=Fate%20of%20the%20Vaal&search=&referenceCurrency=exalted",
+                "url": "https://poe2scout.com/api/items/unique/armour?page=1&perPage=250&league={league}&search=&referenceCurrency=exalted",
                 "required": False
             },
             "Jewels": {
-                "url": "https://poe2scout.com/api/items/unique/jewel?page=1&perPage=250&league=Fate%20of%20the%20Vaal&search=&referenceCurrency=exalted",
+                "url": "https://poe2scout.com/api/items/unique/jewel?page=1&perPage=250&league={league}&search=&referenceCurrency=exalted",
                 "required": False
             },
             "Maps": {
-                "url": "https://poe2scout.com/api/items/unique/map?page=1&perPage=250&league=Fate%20of%20the%20Vaal&search=&referenceCurrency=exalted",
+                "url": "https://poe2scout.com/api/items/unique/map?page=1&perPage=250&league={league}&search=&referenceCurrency=exalted",
                 "required": False
             },
             "Weapons": {
-                "url": "https://poe2scout.com/api/items/unique/weapon?page=1&perPage=250&league=Fate%20of%20the%20Vaal&search=&referenceCurrency=exalted",
+                "url": "https://poe2scout.com/api/items/unique/weapon?page=1&perPage=250&league={league}&search=&referenceCurrency=exalted",
                 "required": False
             },
              "Sanctum": {
-                "url": "https://poe2scout.com/api/items/unique/sanctum?page=1&perPage=250&league=Fate%20of%20the%20Vaal&search=&referenceCurrency=exalted",
+                "url": "https://poe2scout.com/api/items/unique/sanctum?page=1&perPage=250&league={league}&search=&referenceCurrency=exalted",
                 "required": False
             },
             
         }
         
         self.urls = []
+        
+        # Only these fields are read by calculate_values
+        self.payload_fields = {
+            "items": ("id", "name", "text", "type", "currentPrice")
+        }
     
     def get_categories(self):
         """Return available categories."""
         return self.categories
     
-    def set_active_categories(self, active_categories: List[str]):
-        """Set which categories to fetch."""
+    def set_active_categories(self, active_categories: List[str], league: str = None):
+        """Set which categories to fetch (for ``league`` if given)."""
+        if league is not None:
+            self.set_league(league)
         self.urls = []
-        for category in active_categories:
-            if category in self.categories:
-                self.urls.append(self.categories[category]["url"])
+        # Definition order, so the output does not depend on the order the selection was sent in
+        for category in self.categories:
+            if category in active_categories:
+                self.urls.append(self.category_url(category))
+    
+    def quote_league(self, league: str) -> str:
+        """Scout expects spaces in the league parameter encoded as %20."""
+        return quote(league, safe="")
     
     def get_urls(self) -> List[str]:
         """Return list of URLs to fetch from Scout."""
@@ -63,15 +97,93 @@ class ScoutParser(BaseParser):
         """Return the output format template for Scout."""
         return self.output_format
     
-    def fetch_and_parse(self, url: str) -> dict:
-        """Fetch and parse JSON from Scout."""
-        return self.fetch_json_from_url(url)
+    def fetch_and_parse(self, url: str, min_value: float = None, force_refresh: bool = False) -> dict:
+        """
+        Fetch and parse JSON from Scout, following pagination.
+        
+        The page count is read from the first page; remaining pages are
+        fetched concurrently in batches and merged into one ``items`` list.
+        If the items seen so far are sorted by descending price and already
+        dropped below ``min_value``, later pages cannot contain matching items
+        and are not requested (see SCOUT_EARLY_STOP).
+        """
+        first = self.fetch_json_from_url(url, force_refresh)
+        pages = self.get_page_count(first)
+        page_payloads = [first]
+        items = list(first.get('items', []))
+        
+        page = 2
+        while page <= pages and not self.below_threshold(items, min_value):
+            batch = range(page, min(page + PAGE_FETCH_BATCH, pages + 1))
+            page_urls = [self.get_page_url(url, number) for number in batch]
+            for data in map_in_context(PAGE_EXECUTOR, lambda page_url: self.fetch_json_from_url(page_url, force_refresh), page_urls):
+                page_payloads.append(data)
+                items.extend(data.get('items', []))
+            page = batch[-1] + 1
+        
+        if len(page_payloads) == 1:
+            return first
+        
+        def merge():
+            merged = dict(first)
+            merged['items'] = items
+            merged['pagesFetched'] = page - 1
+            return merged
+        
+        versions = tuple(getattr(data, 'fetched_at', None) for data in page_payloads)
+        if None in versions:
+            return merge()
+        # Merges are kept with the first page's cache entry, one per page count, while
+        # the other pages are unchanged, so the merged price index is only built once
+        merges = derived(first, 'merged_pages', dict)
+        cached = merges.get(len(versions))
+        if cached is None or cached[0] != versions:
+            cached = merges[len(versions)] = (versions, CachedPayload(merge(), versions[0]))
+        return cached[1]
+    
+    def source_urls(self, url: str, data: dict) -> List[str]:
+        """Return the URLs of every page merged into ``data``."""
+        return [self.get_page_url(url, number) if number > 1 else url
+                for number in range(1, data.get('pagesFetched', 1) + 1)]
+    
+    def get_page_count(self, data: dict) -> int:
+        """Return the total number of pages reported by a Scout response."""
+        if data.get('pages'):
+            return int(data['pages'])
+        
+        total = data.get('total')
+        per_page = len(data.get('items', []))
+        if total and per_page:
+            return math.ceil(total / per_page)
+        return 1
+    
+    def get_page_url(self, url: str, page: int) -> str:
+        """Return ``url`` with its page parameter set to ``page``."""
+        parts = urlsplit(url)
+        query = [(key, str(page) if key == 'page' else value)
+                 for key, value in parse_qsl(parts.query, keep_blank_values=True)]
+        return urlunsplit(parts._replace(query=urlencode(query, quote_via=quote)))
+    
+    def below_threshold(self, items: List[dict], min_value: float) -> bool:
+        """
+        Return True if items are sorted by descending price and the last one is below ``min_value``.
+        
+        Only the items seen so far can be checked, so this assumes poe2scout
+        keeps the descending order across pages.
+        """
+        if not SCOUT_EARLY_STOP or min_value is None or not items:
+            return False
+        
+        prices = [item.get('currentPrice', 0) for item in items]
+        if any(prices[i] < prices[i + 1] for i in range(len(prices) - 1)):
+            return False
+        return prices[-1] < min_value
     
     def get_base_value(self, data: dict) -> float:
         """Scout prices are already in exalted, so base value is 1.0."""
         return 1.0
     
-    def calculate_values(self, data: dict, base_value: float, min_value: float) -> List[Tuple[str, str, float]]:
+    def calculate_values(self, data: dict, base_value: float, min_value: float, limit: int = None) -> ItemSection:
         """
         Calculate values for all items from Scout data.
         
@@ -79,26 +191,33 @@ class ScoutParser(BaseParser):
             data: JSON data from Scout
             base_value: Base value (always 1.0 for Scout since prices are in exalted)
             min_value: Minimum exalted value to include
+            limit: Only include the ``limit`` most valuable matching items
         
         Returns:
-            List of tuples: (item_id, item_name, item_type, exalted_value)
+            ItemSection with the id, name, type and exalted value of every matching item
         """
-        results = []
+        index = get_price_index(data, self.build_price_index)
         
-        # Scout returns items with currentPrice already in exalted
-        for item in data.get('items', []):
-            item_id = str(item.get('id', ''))
-            item_name = item.get('name', item.get('text', 'Unknown'))
-            item_type = item.get('type', 'Unknown')
-            exalted_value = item.get('currentPrice', 0)
+        results = ItemSection(output_format=self.output_format)
+        for i in index.positions_at_least(min_value, limit):
+            exalted_value = index.values[i]
             
             # Only include items that meet the minimum value threshold
             if exalted_value >= min_value:
-                # Return tuple with type included
-                results.append((item_id, item_name, item_type, exalted_value))
+                results.append(index.ids[i], index.names[i], exalted_value, index.types[i])
         
         return results
     
+    def build_price_index(self, data: dict) -> PriceIndex:
+        """Load the items of a Scout payload into a columnar price index."""
+        items = data.get('items', [])
+        ids = [str(item.get('id', '')) for item in items]
+        names = [item.get('name', item.get('text', 'Unknown')) for item in items]
+        types = [item.get('type', 'Unknown') for item in items]
+        # Scout returns items with currentPrice already in exalted
+        values = array('d', [item.get('currentPrice', 0) for item in items])
+        return PriceIndex(ids, names, values, types)
+    
     def extract_section_name(self, url: str) -> str:
         """Extract section name from the URL."""
         # Extract category from URL pattern: /unique/{category}
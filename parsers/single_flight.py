@@ -0,0 +1,75 @@
+"""
+Single-flight deduplication of concurrent upstream fetches.
+
+When several threads ask for the same key at the same time, only the first
+one (the leader) runs the call; the others wait for and share its result.
+"""
+import contextvars
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn, *args, **kwargs):
+        """Run ``fn`` for ``key`` unless a call for the same key is already in flight."""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    def start(self, key: str, fn, *args, **kwargs) -> Future:
+        """
+        Start ``fn`` for ``key`` in a new thread unless a call for the same key
+        is already in flight, and return the future of the call.
+
+        Only the leader gets a thread, which runs in a copy of the caller's
+        context, so concurrent callers never wait for a free worker.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = Future()
+            self.calls[key] = future
+
+        def run():
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                with self.lock:
+                    del self.calls[key]
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), name=f"single-flight {key}", daemon=True).start()
+        return future
@@ -2,6 +2,7 @@
 Parser for static filter rules that don't require external API data.
 """
 from typing import List, Dict
+from .render import create_section_header
 
 
 class StaticParser:
@@ -95,17 +96,4 @@ class StaticParser:
     
     def create_section_header(self, section_name: str) -> str:
         """Create a boxed section header."""
-        box_width = 85
-        line = "/" * box_width
-        
-        padding = box_width - 4 - len(section_name)
-        left_pad = padding // 2
-        right_pad = padding - left_pad
-        
-        header = f"{line}\n"
-        header += f"//{' ' * (box_width - 4)}//\n"
-        header += f"//{' ' * left_pad}{section_name}{' ' * right_pad}//\n"
-        header += f"//{' ' * (box_width - 4)}//\n"
-        header += f"{line}"
-        
-        return header
+        return create_section_header(section_name).rstrip("\n")